@@ -6,6 +6,7 @@ from pymysql import Error
 from pydantic import BaseModel
 import configparser
 
+import executor
 import get_schools_agents
 from MBTIseek import CareerRecommender
 
@@ -55,6 +56,8 @@ scores = {'E': 0, 'S': 0, 'F': 0, 'J': 0}
 
 results=[0]*40
 
+recommender = CareerRecommender()
+
 class Type(BaseModel):
     mbti_type: str
 class Choice(BaseModel):
@@ -82,7 +85,7 @@ async def choice(choice: Choice):
     mbti_type += 'S' if scores['S'] > 0 else 'N'
     mbti_type += 'F' if scores['F'] > 0 else 'T'
     mbti_type += 'J' if scores['J'] > 0 else 'P'
-    get_schools_agents.seek( mbti_type)
+    await executor.run_blocking("mysql", get_schools_agents.seek, mbti_type)
     return mbti_type
 
 async def clear():
@@ -94,9 +97,10 @@ async def clear():
 
 
 async def seek(mbti_type: Type):
-    # 获取职业推荐
-    recommender = CareerRecommender()
-    return {"description":recommender.get_career_recommendation_prepared(mbti_type.mbti_type)}
+    # 获取职业推荐（复用同一个数据库引擎，查询放到线程池）
+    description = await executor.run_blocking("mysql", recommender.get_career_recommendation_prepared,
+                                              mbti_type.mbti_type)
+    return {"description": description}
 
 
 
@@ -0,0 +1,83 @@
+import configparser
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from profession_annalysis3 import MajorAnalysisAgent, MajorAnalysisResult, UserInput
+
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+
+class TTLCache:
+    """带过期时间的 LRU 缓存：超过 ttl 秒的条目视为不存在，超过 maxsize 时淘汰最久未使用的条目"""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# 分类结果缓存：/process 和 /get_dynamic_kg 对同一输入只调用一次LLM
+analysis_cache = TTLCache(
+    maxsize=config.getint('cache', 'analysis_maxsize', fallback=512),
+    ttl=config.getfloat('cache', 'analysis_ttl', fallback=600),
+)
+
+
+def cache_key(user_input: UserInput, kg_version: str = "") -> tuple:
+    """按标准化后的查询生成缓存键；带上图谱版本，重新加载图谱后旧结果自动失效"""
+    query = re.sub(r"\s+", " ", user_input.normalized_query).strip().lower()
+    return kg_version, query
+
+
+async def analyze_cached(agent: MajorAnalysisAgent, user_input: UserInput,
+                         kg_version: str = "") -> MajorAnalysisResult:
+    """带缓存的 agent.analyze"""
+    key = cache_key(user_input, kg_version)
+    result = analysis_cache.get(key)
+    if result is None:
+        result = await agent.analyze(user_input)
+        analysis_cache.set(key, result)
+    return result
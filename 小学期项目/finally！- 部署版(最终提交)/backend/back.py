@@ -1,12 +1,19 @@
+import asyncio
 from fastapi import FastAPI,Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import chatback
 import MBTI_back
 import get_schools_agents
 import password
 import chat_agent
 import backend
+import kg_store
+import llm_clients
+import executor
+import llm_metrics
+import llm_router
+import recommend_index
 
 origins = MBTI_back.origins
 app = FastAPI()
@@ -17,6 +24,27 @@ app.add_middleware(
     allow_methods=["*"],              # 允许所有方法
     allow_headers=["*"],              # 允许所有头
 )
+
+@app.on_event("startup")
+async def load_kg():
+    # 启动时加载一次知识图谱快照，所有请求共享
+    kg_store.reload_snapshot()
+
+@app.on_event("startup")
+async def load_recommend_index():
+    # 启动时把招生数据载入内存推荐索引；数据库暂不可用时推迟到第一次推荐再加载
+    if get_schools_agents.recommend_mode == "index":
+        try:
+            await asyncio.to_thread(recommend_index.reload_index)
+        except Exception as e:
+            print(f"推荐索引加载失败，将在首次推荐时重试: {e}")
+
+@app.on_event("shutdown")
+async def close_clients():
+    # 关闭共享的大模型连接池和阻塞调用线程池
+    await llm_clients.registry.aclose()
+    executor.shutdown()
+
 @app.post('/api/orange/questions')
 async def create_questions():
     return await MBTI_back.create_questions()  # 添加 await
@@ -46,6 +74,10 @@ async def smart_recommend():
     result = await get_schools_agents.smart_recommend()
     return JSONResponse(content=result, status_code=200)
 
+@app.post("/api/orange/recommend/reload")
+async def reload_recommend_index():
+    return await get_schools_agents.reload_index()
+
 @app.post("/process")
 async def process(request: Request):
     return await backend.process(request)
@@ -54,6 +86,22 @@ async def process(request: Request):
 async def get_dynamic_kg(request: Request):
     return await backend.get_dynamic_kg(request)
 
+@app.post("/api/orange/kg/reload")
+async def reload_kg():
+    return await backend.reload_kg()
+
+@app.post("/api/orange/kg/traverse")
+async def traverse_kg(request: backend.TraverseRequest):
+    return await backend.traverse_kg(request)
+
+@app.post("/api/orange/kg/paths")
+async def kg_paths(request: backend.PathRequest):
+    return await backend.kg_paths(request)
+
+@app.get("/api/orange/cache/stats")
+async def cache_stats():
+    return await backend.cache_stats()
+
 @app.post("/api/orange/register")
 async def register(thisuser:password.user):
     return await password.reg(thisuser)
@@ -84,6 +132,16 @@ async def stream_chat(request: chatback.ChatRequest):
 async def health_check():
     return await chatback.health_check()
 
+@app.get("/api/orange/llm/routes")
+async def llm_routes():
+    # 各路由器中服务商的滚动延迟、错误率和熔断状态
+    return {name: router.snapshot() for name, router in llm_router.routers.items()}
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus 文本格式的大模型调用指标
+    return PlainTextResponse(llm_metrics.render(), media_type="text/plain; version=0.0.4")
+
 
 
 if __name__ == "__main__":
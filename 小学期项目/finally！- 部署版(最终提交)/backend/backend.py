@@ -1,13 +1,19 @@
 import configparser
+from typing import List
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from profession_annalysis3 import KnowledgeGraphTool, MajorAnalysisAgent, analyze_user_query
+from profession_annalysis3 import KnowledgeGraphTool, MajorAnalysisAgent, LOCAL_CLASSIFY_THRESHOLD, \
+    LOCAL_CLASSIFY_MARGIN, LOCAL_CLASSIFY_RELATIVE, llm_flights, explain_fanout
+import kg_store
+from analysis_cache import analysis_cache, analyze_cached
+from llm_cache import explanation_cache
+from semantic_cache import chat_cache
 from fastapi.responses import StreamingResponse, JSONResponse
 import json
-import jieba
 import asyncio
+import contextlib
 import logging
 
 app = FastAPI()
@@ -21,6 +27,12 @@ config = configparser.ConfigParser()
 config.read('config.ini')
 
 frontward = config['IP']['frontward']#   前端地址
+# 本地分类器置信度阈值，设为大于1的值即可关闭本地分类、始终使用LLM
+classifier_threshold = config.getfloat('kg', 'classifier_threshold', fallback=LOCAL_CLASSIFY_THRESHOLD)
+classifier_margin = config.getfloat('kg', 'classifier_margin', fallback=LOCAL_CLASSIFY_MARGIN)
+classifier_relative = config.getfloat('kg', 'classifier_relative', fallback=LOCAL_CLASSIFY_RELATIVE)
+# 流水线模式：需要调用LLM分类时，先按关键词匹配的专业类开始流式解释，分类结果稍后以 categories 事件补发
+pipeline_default = config.getboolean('kg', 'pipeline', fallback=True)
 origins = [
     f"http://{frontward}/8501"
            ]
@@ -36,52 +48,114 @@ app.add_middleware(
 class UserInput(BaseModel):
     text: str
 
+
+class TraverseRequest(BaseModel):
+    entities: List[str]
+    direction: str = "descendants"  # descendants / ancestors / both
+    depth: int = 2
+    max_nodes: int = 200
+    max_edges: int = 500
+
+
+class PathRequest(BaseModel):
+    source: str
+    target: str
+    max_depth: int = 4
+    max_paths: int = 10
+
+def pipeline_draft(kg_tool: KnowledgeGraphTool, raw_query: str) -> List[str]:
+    """流水线的初步专业类：关键词匹配到、并且本地分类器也排在前列的专业类；两者不一致时不提前解释"""
+    candidates = {cls for cls, score in kg_tool.classifier.classify([raw_query], k=5)[0] if score > 0}
+    return [cls for cls in kg_tool.classify_by_keywords(raw_query) if cls in candidates]
+
+
 # 接收 POST 请求的端点
 async def process(request: Request):
     data = await request.json()
     user_input = data["text"]
-    # 读取知识图谱数据
-    with open("output/output_all.txt", "r", encoding="utf-8") as f:
-        kg_data = []
-        for line in f:
-            line = line.strip()
-            if not line or not line.startswith("("):
-                continue
-            line = line.strip("()")
-            parts = [p.strip() for p in line.split(";")]
-            if len(parts) >= 4:
-                kg_data.append(tuple(parts))
-    # 主流程：结构化分析
-    kg_tool = KnowledgeGraphTool(kg_data)
+    # 为 True 时在流中附带知识图谱子图（type=kg），前端无需再请求 /get_dynamic_kg
+    with_kg = bool(data.get("with_kg", False))
+    pipeline = bool(data.get("pipeline", pipeline_default))
+    # 使用启动时加载的知识图谱快照，不再每次请求重新读取和建索引
+    snapshot = kg_store.get_snapshot()
+    kg_tool = snapshot.kg_tool
+    # 主流程：结构化分析（同一输入的分类结果在 /process 和 /get_dynamic_kg 之间共享）
     normalized_input = kg_tool.normalize_keywords(user_input)
-    agent = MajorAnalysisAgent(kg_tool)
-    result = await agent.analyze(normalized_input)
-    # 流式 explanation
+    agent = MajorAnalysisAgent(kg_tool, local_threshold=classifier_threshold, response_cache=explanation_cache,
+                               local_margin=classifier_margin, local_relative=classifier_relative)
+    analysis = asyncio.ensure_future(analyze_cached(agent, normalized_input, snapshot.version))
+    # 让分类任务先运行一步：缓存命中或本地分类器足够确定时此时已完成，不需要流水线
+    await asyncio.sleep(0)
+    draft = []
+    if pipeline and not analysis.done():
+        draft = pipeline_draft(kg_tool, normalized_input.raw_query)
+
+    def event(type_, content):
+        return f"data: {json.dumps({'type': type_, 'content': content}, ensure_ascii=False)}\n\n"
+
+    def categories_events(final_result):
+        events = [event("categories", {"categories": final_result.matched_categories, "final": True})]
+        if with_kg:
+            events.append(event("kg", kg_tool.get_subgraph(final_result.matched_categories[:10])))
+        return events
+
+    # 流式 explanation；分类结果在流内等待，没有初步结果时也能立即开始响应
     async def event_stream():
         try:
+            final = None
+            if draft:
+                categories = draft
+                yield event("categories", {"categories": draft, "final": False})
+            else:
+                if not analysis.done():
+                    yield event("status", "正在识别专业类别…")
+                final = await analysis
+                categories = final.matched_categories
+                for e in categories_events(final):
+                    yield e
             logger.info("开始流式输出...")
-            async for chunk in agent.explain_user_tendency_stream(normalized_input, result.matched_categories):
-                if chunk:
-                    if not isinstance(chunk, str):
-                        chunk = str(chunk)
-                    logger.info(f"发送chunk: {chunk[:50]}...")
-                    data = {"type": "content", "content": chunk}
-                    yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+            while True:
+                restart = False
+                async with contextlib.aclosing(agent.explain_user_tendency_stream(normalized_input, categories)) as stream:
+                    async for chunk in stream:
+                        if chunk:
+                            if not isinstance(chunk, str):
+                                chunk = str(chunk)
+                            logger.info(f"发送chunk: {chunk[:50]}...")
+                            yield event("content", chunk)
+                        # 分类完成后尽快补发最终的专业类（及知识图谱）；与初步结果不同时停止这段解释
+                        if final is None and analysis.done():
+                            final = analysis.result()
+                            for e in categories_events(final):
+                                yield e
+                            restart = set(final.matched_categories) != set(categories)
+                            if restart:
+                                break
+                if final is None:
+                    final = await analysis
+                    for e in categories_events(final):
+                        yield e
+                    restart = set(final.matched_categories) != set(categories)
+                if not restart:
+                    break
+                # 已输出的解释基于初步专业类，通知前端清空后按最终专业类重新解释
+                logger.info(f"最终专业类与初步结果不同，重新解释: {categories} -> {final.matched_categories}")
+                categories = final.matched_categories
+                yield event("reset", "识别结果已更新，正在按最终的专业类别重新分析…")
             logger.info("流式输出完成，发送结束标记...")
-            end_data = {"type": "end", "content": ""}
-            yield f"data: {json.dumps(end_data, ensure_ascii=False)}\n\n"
+            yield event("end", "")
         except asyncio.TimeoutError:
             logger.error("LLM流式调用超时")
-            data = {"type": "error", "content": "分析超时，请重试"}
-            yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
-            end_data = {"type": "end", "content": ""}
-            yield f"data: {json.dumps(end_data, ensure_ascii=False)}\n\n"
+            yield event("error", "分析超时，请重试")
+            yield event("end", "")
         except Exception as e:
             logger.error(f"流式输出异常: {str(e)}")
-            data = {"type": "error", "content": f"分析过程中出现错误: {str(e)}"}
-            yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
-            end_data = {"type": "end", "content": ""}
-            yield f"data: {json.dumps(end_data, ensure_ascii=False)}\n\n"
+            yield event("error", f"分析过程中出现错误: {str(e)}")
+            yield event("end", "")
+        finally:
+            # 解释流出错或客户端断开时，不再等待的分类任务随之取消
+            if not analysis.done():
+                analysis.cancel()
     return StreamingResponse(
             event_stream(),
             media_type="text/plain",
@@ -95,19 +169,54 @@ async def process(request: Request):
 async def get_dynamic_kg(request: Request):
     data = await request.json()
     user_input = data.get("text", "")
-    kg_data = []
     try:
-        with open("output/output_all.txt", "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line or not line.startswith("("):
-                    continue
-                line = line.strip("()")
-                parts = [p.strip() for p in line.split(";")]
-                if len(parts) >= 4:
-                    kg_data.append(tuple(parts))
-        # 调用analyze_user_query分析
-        result = await analyze_user_query(kg_data, user_input)
-        return JSONResponse(content={"kg_data": result})
+        snapshot = kg_store.get_snapshot()
+        kg_tool = snapshot.kg_tool
+        # 与 /process 共用分类结果缓存
+        normalized_input = kg_tool.normalize_keywords(user_input)
+        agent = MajorAnalysisAgent(kg_tool, local_threshold=classifier_threshold, local_margin=classifier_margin,
+                                   local_relative=classifier_relative)
+        result = await analyze_cached(agent, normalized_input, snapshot.version)
+        # 直接合并预计算的专业类子图：kg_data 为四元组，nodes/edges 供前端直接绘图
+        return JSONResponse(content=kg_tool.get_subgraph(result.matched_categories[:10]))
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+async def reload_kg():
+    """重新加载知识图谱（更新 output_all.txt 后调用）"""
+    try:
+        snapshot = await asyncio.to_thread(kg_store.reload_snapshot)
+        analysis_cache.clear()
+        return JSONResponse(content={"status": "success", "kg": snapshot.info()})
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+async def cache_stats():
+    """分类结果缓存、解释响应缓存、推荐对话近似问题缓存的命中情况，以及合并的并发LLM调用"""
+    return {"analysis": analysis_cache.stats(), "explanation": explanation_cache.stats(), "chat": chat_cache.stats(),
+            "coalesced": {"classify": llm_flights.stats(), "explain": explain_fanout.stats()}}
+
+
+async def traverse_kg(request: TraverseRequest):
+    """批量多跳遍历：一次请求返回多个实体各自的上级/下级邻域"""
+    kg_tool = kg_store.get_snapshot().kg_tool
+    try:
+        result = kg_tool.batch_traverse(
+            request.entities,
+            direction=request.direction,
+            depth=request.depth,
+            max_nodes=request.max_nodes,
+            max_edges=request.max_edges,
+        )
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    return JSONResponse(content={"results": result})
+
+
+async def kg_paths(request: PathRequest):
+    """两个实体之间的最短路径"""
+    kg_tool = kg_store.get_snapshot().kg_tool
+    paths = kg_tool.find_paths(request.source, request.target, request.max_depth, request.max_paths)
+    return JSONResponse(content={"source": request.source, "target": request.target, "paths": paths})
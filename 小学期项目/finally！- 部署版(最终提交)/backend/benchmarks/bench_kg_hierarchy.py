@@ -0,0 +1,110 @@
+"""
+get_class_hierarchy 性能对比：旧版全量扫描 vs 邻接索引
+
+用法（在 backend 目录下运行）：
+    python benchmarks/bench_kg_hierarchy.py
+    python benchmarks/bench_kg_hierarchy.py --scale 100 --classes 10
+"""
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kg_store import KG_PATH, load_kg_data
+from profession_annalysis3 import KnowledgeGraphTool
+
+
+class LegacyKG:
+    """旧版 KnowledgeGraphTool 的数据：四元组列表 + 按实体登记的关系"""
+
+    def __init__(self, kg_data):
+        self.kg_data = kg_data
+        self.relations = defaultdict(list)
+        for item in kg_data:
+            if item[0] == "实体关系":
+                relation = {"subject": item[1], "relation": item[2], "object": item[3]}
+                self.relations[item[1]].append(relation)
+                self.relations[item[3]].append(relation)
+
+
+def legacy_class_hierarchy(kg, class_name):
+    """旧版实现：遍历所有关系，每次命中再扫描整个 kg_data"""
+    results = []
+    for item in kg.kg_data:
+        if len(item) >= 4 and item[1] == class_name:
+            results.append(item)
+    for rels in kg.relations.values():
+        for rel in rels:
+            if rel["relation"] == "包含" and rel["object"] == class_name:
+                for item in kg.kg_data:
+                    if len(item) >= 4 and item[1] == rel["subject"]:
+                        results.append(item)
+                results.append(("实体关系", rel["subject"], "包含", class_name))
+    for rel in kg.relations.get(class_name, []):
+        if rel["relation"] == "包含" and rel["subject"] == class_name:
+            obj = rel["object"]
+            for item in kg.kg_data:
+                if len(item) >= 4 and item[1] == obj:
+                    results.append(item)
+            results.append(("实体关系", class_name, "包含", obj))
+    return results
+
+
+def synthetic_kg(kg_data, scale):
+    """把真实图谱复制 scale 份，每份实体名加后缀，保持同样的层级结构"""
+    if scale <= 1:
+        return list(kg_data)
+    data = []
+    for i in range(scale):
+        suffix = "" if i == 0 else f"#{i}"
+        for item in kg_data:
+            item_type, subject, predicate, obj = item[:4]
+            if item_type == "实体关系":
+                data.append((item_type, subject + suffix, predicate, obj + suffix))
+            else:
+                data.append((item_type, subject + suffix, predicate, obj))
+    return data
+
+
+def bench(fn, kg, classes, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for cls in classes:
+            fn(kg, cls)
+    return (time.perf_counter() - start) / (repeat * len(classes))
+
+
+def run(kg_data, scale, n_classes, repeat):
+    data = synthetic_kg(kg_data, scale)
+    kg_tool = KnowledgeGraphTool(data)
+    legacy_kg = LegacyKG(data)
+    classes = sorted(c for c in kg_tool.profession_classes if "#" not in c)[:n_classes]
+
+    # 结果一致性检查（旧版会把上级关系重复添加一次，这里按集合比较）
+    for cls in classes:
+        assert set(legacy_class_hierarchy(legacy_kg, cls)) == set(kg_tool.get_class_hierarchy(cls)), cls
+
+    legacy = bench(legacy_class_hierarchy, legacy_kg, classes, repeat)
+    indexed = bench(lambda tool, cls: tool.get_class_hierarchy(cls), kg_tool, classes, repeat * 100)
+    print(f"scale={scale:<4} 四元组={len(data):<8} 专业类={len(classes):<3} "
+          f"旧版={legacy * 1000:9.3f} ms/类  索引={indexed * 1000:7.4f} ms/类  加速={legacy / indexed:8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="get_class_hierarchy 性能对比")
+    parser.add_argument("--kg", default=KG_PATH, help="知识图谱文件")
+    parser.add_argument("--scale", type=int, default=100, help="合成图谱的放大倍数")
+    parser.add_argument("--classes", type=int, default=10, help="参与测试的专业类数量")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    kg_data = load_kg_data(args.kg)
+    run(kg_data, 1, args.classes, args.repeat)
+    run(kg_data, args.scale, args.classes, 1)
+
+
+if __name__ == "__main__":
+    main()
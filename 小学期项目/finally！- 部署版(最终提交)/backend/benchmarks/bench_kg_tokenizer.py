@@ -0,0 +1,96 @@
+"""
+分词器对比：全局 jieba + 逐词 add_word vs 预构建的独立分词器（kg_tokenizer）
+
+冷启动在独立子进程中测量，分别统计启动阶段和启动后第一个请求的耗时
+用法（在 backend 目录下运行）：
+    python benchmarks/bench_kg_tokenizer.py
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+QUERIES = ["我对计算机和物理学感兴趣", "以后想当医生，临床医学怎么样", "喜欢软件工程和金融", "我想学人工智能或者数据科学与大数据技术"]
+
+# 子进程输出两项：启动阶段耗时、启动后第一个请求的分词耗时
+_LEGACY_COLD = """
+import time; t = time.perf_counter()
+import jieba, logging; jieba.setLogLevel(logging.WARNING)
+from kg_binary import load_kg_data
+entities = {e[1] for e in load_kg_data() if e[0] == "实体"}
+startup = time.perf_counter() - t; t = time.perf_counter()
+for entity in entities:
+    jieba.add_word(entity, 10); jieba.add_word(entity.split(" ")[0], 10)
+jieba.lcut("我对计算机和物理学感兴趣")
+print(startup, time.perf_counter() - t)
+"""
+
+_NEW_COLD = """
+import time; t = time.perf_counter()
+import jieba, logging; jieba.setLogLevel(logging.WARNING)
+from kg_binary import load_kg_data
+from kg_tokenizer import build_tokenizer
+tokenizer = build_tokenizer({e[1] for e in load_kg_data() if e[0] == "实体"})
+startup = time.perf_counter() - t; t = time.perf_counter()
+tokenizer.lcut("我对计算机和物理学感兴趣")
+print(startup, time.perf_counter() - t)
+"""
+
+
+def cold_start(code, runs):
+    """返回 (平均启动耗时, 平均首个请求耗时)"""
+    startup, first = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+        a, b = out.stdout.strip().splitlines()[-1].split()
+        startup.append(float(a))
+        first.append(float(b))
+    return sum(startup) / runs, sum(first) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识图谱分词器对比")
+    parser.add_argument("--runs", type=int, default=5, help="冷启动子进程次数")
+    parser.add_argument("--requests", type=int, default=200, help="单请求耗时的重复次数")
+    args = parser.parse_args()
+
+    import logging
+    import jieba
+    jieba.setLogLevel(logging.WARNING)
+    from kg_binary import load_kg_data
+    from kg_tokenizer import build_tokenizer
+
+    entities = {e[1] for e in load_kg_data() if e[0] == "实体"}
+    tokenizer = build_tokenizer(entities)  # 同时预热磁盘缓存
+
+    # 旧版：每个请求都要对全局 jieba 重新 add_word 一遍再分词
+    def legacy_request(query):
+        for entity in entities:
+            jieba.add_word(entity, 10)
+            jieba.add_word(entity.split(" ")[0], 10)
+        return jieba.lcut(query)
+
+    for query in QUERIES:
+        assert legacy_request(query) == tokenizer.lcut(query), query
+
+    def per_request(fn):
+        start = time.perf_counter()
+        for i in range(args.requests):
+            fn(QUERIES[i % len(QUERIES)])
+        return (time.perf_counter() - start) / args.requests
+
+    legacy_cold = cold_start(_LEGACY_COLD, args.runs)
+    new_cold = cold_start(_NEW_COLD, args.runs)
+    print(f"冷启动  旧版: 启动={legacy_cold[0]:.3f}s 首个请求={legacy_cold[1] * 1000:.1f} ms   "
+          f"新版: 启动={new_cold[0]:.3f}s 首个请求={new_cold[1] * 1000:.1f} ms")
+    legacy = per_request(legacy_request)
+    new = per_request(tokenizer.lcut)
+    print(f"单请求分词        旧版={legacy * 1000:.3f} ms  新版={new * 1000:.3f} ms  加速={legacy / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+本地专业类分类器的阈值标定：在标注查询集上网格搜索 最高分阈值 / 第一二名差距（第二名不超过最高分的 1 - margin）/ 相对比例
+
+标注集 classify_labeled.jsonl 每行一条查询：
+    {"query": "我喜欢医学", "expected": ["临床医学类"], "acceptable": ["基础医学类", ...]}
+expected 是正确答案必须包含的专业类，acceptable 是允许一并返回的专业类；expected 为空表示查询太笼统，本地不应作答
+本地结果只有满足 expected ⊆ 结果 ⊆ expected ∪ acceptable 才算正确，否则是一次“答错且跳过了LLM”
+
+选取规则：本地作答的准确率不低于 --min-precision 的组合中，本地答对条数最多者（其次准确率高、阈值大、差距大）
+同时做两折交叉验证（按行号奇偶划分），报告在未参与标定的一半上的表现
+用法（在 backend 目录下运行）：
+    python benchmarks/eval_local_classifier.py
+    python benchmarks/eval_local_classifier.py --min-precision 0.9 --show-errors
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+LABELED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "classify_labeled.jsonl")
+
+THRESHOLDS = np.round(np.arange(0.10, 0.801, 0.02), 2)
+MARGINS = np.round(np.arange(0.0, 0.501, 0.02), 2)
+RELATIVES = np.round(np.arange(0.50, 1.001, 0.05), 2)
+
+
+def load_labeled(path: str = LABELED_PATH) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def judge(classes, item) -> bool:
+    expected, allowed = set(item["expected"]), set(item["expected"]) | set(item["acceptable"])
+    return expected <= set(classes) <= allowed
+
+
+def evaluate(scored_list, items, threshold, margin, relative):
+    """返回 (本地作答条数, 本地答对条数, 每条的本地结果)"""
+    from profession_annalysis3 import select_local_classes
+
+    answered = correct = 0
+    results = []
+    for scored, item in zip(scored_list, items):
+        classes = select_local_classes(scored, threshold, margin, relative)
+        results.append(classes)
+        if classes:
+            answered += 1
+            correct += judge(classes, item)
+    return answered, correct, results
+
+
+def calibrate(scored_list, items, min_precision):
+    """返回最优的 (threshold, margin, relative)，没有满足准确率要求的组合时返回 None"""
+    best, best_key = None, None
+    for threshold, margin, relative in itertools.product(THRESHOLDS, MARGINS, RELATIVES):
+        answered, correct, _ = evaluate(scored_list, items, threshold, margin, relative)
+        if not answered or correct / answered < min_precision:
+            continue
+        key = (correct, correct / answered, threshold, margin, -relative)
+        if best_key is None or key > best_key:
+            best, best_key = (float(threshold), float(margin), float(relative)), key
+    return best
+
+
+def report(name, scored_list, items, params):
+    answered, correct, _ = evaluate(scored_list, items, *params)
+    precision = correct / answered if answered else 0.0
+    print(f"{name:<28} threshold={params[0]:.2f} margin={params[1]:.2f} relative={params[2]:.2f}  "
+          f"本地作答={answered:>3}/{len(items)} ({answered / len(items):.0%})  答对={correct:>3}  准确率={precision:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地专业类分类器阈值标定")
+    parser.add_argument("--labeled", default=LABELED_PATH, help="标注查询集")
+    parser.add_argument("--min-precision", type=float, default=0.95, help="本地作答的最低准确率")
+    parser.add_argument("--show-errors", action="store_true", help="列出标定结果下本地答错的查询")
+    args = parser.parse_args()
+
+    import logging
+    import jieba
+    jieba.setLogLevel(logging.WARNING)
+    import kg_store
+    from profession_annalysis3 import LOCAL_CLASSIFY_MARGIN, LOCAL_CLASSIFY_RELATIVE, LOCAL_CLASSIFY_THRESHOLD
+
+    kg_tool = kg_store.get_snapshot().kg_tool
+    items = load_labeled(args.labeled)
+    unknown = {c for item in items for c in item["expected"] + item["acceptable"]} - kg_tool.profession_classes
+    if unknown:
+        raise SystemExit(f"标注集中有图谱里不存在的专业类: {sorted(unknown)}")
+    # 与线上一致：先按图谱词典分词，再对分词结果分类
+    queries = [kg_tool.normalize_keywords(item["query"]).raw_query for item in items]
+    scored_list = kg_tool.classifier.classify(queries, k=5)
+
+    current = (LOCAL_CLASSIFY_THRESHOLD, LOCAL_CLASSIFY_MARGIN, LOCAL_CLASSIFY_RELATIVE)
+    report("当前取值", scored_list, items, current)
+
+    folds = [list(range(0, len(items), 2)), list(range(1, len(items), 2))]
+    for i, (fit, held_out) in enumerate((folds, folds[::-1])):
+        params = calibrate([scored_list[j] for j in fit], [items[j] for j in fit], args.min_precision)
+        if params is None:
+            print(f"第{i + 1}折: 没有准确率不低于 {args.min_precision:.0%} 的组合")
+            continue
+        report(f"第{i + 1}折 未参与标定的一半", [scored_list[j] for j in held_out], [items[j] for j in held_out], params)
+
+    params = calibrate(scored_list, items, args.min_precision)
+    if params is None:
+        raise SystemExit(f"没有准确率不低于 {args.min_precision:.0%} 的组合")
+    report("全量标定", scored_list, items, params)
+
+    if args.show_errors:
+        _, _, results = evaluate(scored_list, items, *params)
+        for item, scored, classes in zip(items, scored_list, results):
+            if classes and not judge(classes, item):
+                print(f"  答错: {item['query']} -> {classes}  期望 {item['expected']}  分数 {scored[:3]}")
+
+
+if __name__ == "__main__":
+    main()
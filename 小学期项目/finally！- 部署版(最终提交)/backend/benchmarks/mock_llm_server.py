@@ -0,0 +1,179 @@
+"""
+OpenAI 兼容的本地模拟大模型服务，用于离线压测和性能分析（不消耗真实 token，也不需要联网）
+
+实现 POST /chat/completions（以及 /v1/chat/completions），支持流式与非流式；
+首字延迟、生成速度、错误率可配置，回复内容按以下顺序决定：
+1. --script 指定的 JSON 文件：[{"match": "正则", "response": "回复"}]，按顺序匹配整个 prompt
+2. 内置规则：专业分类 prompt 返回专业类列表；chat_agent 的 structured-chat agent 返回带固定 SQL 的 Final Answer
+3. 其余请求返回 --tokens 个 token 的中文文本
+
+用法（在 backend 目录下运行）：
+    python benchmarks/mock_llm_server.py --port 9000 --ttft 0.4 --tps 40 --error-rate 0.01
+    export DEEPSEEK_BASE_URL=http://127.0.0.1:9000/v1
+    export OPENAI_DEEPSEEK_BASE_URL_FREE=http://127.0.0.1:9000/v1
+    export ZHIPU_BASE_URL=http://127.0.0.1:9000/v1
+    python back.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class MockSettings:
+    ttft: float = 0.5           # 首字延迟（秒）
+    ttft_jitter: float = 0.0    # 首字延迟的随机波动（秒）
+    tps: float = 50.0           # 生成速度（token/秒），<=0 表示不限速
+    chunk_tokens: int = 2       # 每个流式分块的 token 数
+    error_rate: float = 0.0     # 随机返回错误的概率
+    error_status: int = 503
+    tokens: int = 300           # 默认回复长度
+    classes: str = "计算机类, 电子信息类"
+    script: List[dict] = field(default_factory=list)
+
+
+settings = MockSettings()
+app = FastAPI(title="Mock LLM")
+
+# 与 get_schools_agents.smart_recommend 要求的字段一致：院校名称, 专业名称, 所在地, 招生人数, 平均分
+CANNED_SQL = """WITH 基础数据 AS (
+    SELECT e.院校名称, e.专业名称, e.所在地,
+           CAST(REPLACE(e.计划数, ',', '') AS UNSIGNED) AS 招生人数,
+           AVG(a.总成绩) AS 平均分
+    FROM tianjin_enrollment_plan e
+    JOIN tianjin_college_admission a ON e.院校名称 = a.院校名称
+    WHERE CAST(REPLACE(e.计划数, ',', '') AS UNSIGNED) > 0{major_filter}
+    GROUP BY e.院校名称, e.专业名称, e.计划数, e.所在地
+)
+SELECT 院校名称, 专业名称, 所在地, 招生人数, 平均分
+FROM 基础数据
+WHERE 平均分 < {score} + 20
+ORDER BY (1 - ABS(平均分 - {score}) / 50) DESC
+LIMIT 200"""
+
+FILLER = "这是模拟大模型生成的回答内容，用于压测后端的流式输出与并发处理能力。"
+
+
+def prompt_text(body: dict) -> str:
+    parts = []
+    for message in body.get("messages", []):
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def canned_sql(prompt: str) -> str:
+    score = re.search(r"考生分数：\s*([\d.]+)", prompt)
+    major = re.search(r"意向专业：\s*([^（(\s]+)", prompt)
+    major_filter = ""
+    if major and major.group(1) != "不限":
+        major_filter = f"\n      AND e.专业名称 LIKE '%{major.group(1)}%'"
+    return CANNED_SQL.format(score=score.group(1) if score else 600, major_filter=major_filter)
+
+
+def reply_for(prompt: str) -> str:
+    for rule in settings.script:
+        if re.search(rule["match"], prompt):
+            return rule["response"]
+    if "相关专业类别：" in prompt:
+        return settings.classes
+    if '"action"' in prompt and "Final Answer" in prompt:
+        # structured-chat agent：直接给出最终答案（SQL），不调用工具
+        blob = json.dumps({"action": "Final Answer", "action_input": canned_sql(prompt)}, ensure_ascii=False)
+        return f"Action:\n```\n{blob}\n```"
+    return (FILLER * (settings.tokens // len(FILLER) + 1))[:settings.tokens]
+
+
+def count_tokens(text: str) -> int:
+    """模拟计数：中文按字、其余按 4 字符 1 个 token"""
+    cjk = len(re.findall(r"[一-鿿]", text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def chunk(completion_id: str, model: str, delta: dict, finish: Optional[str] = None) -> str:
+    payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+               "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.post("/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "mock")
+    if random.random() < settings.error_rate:
+        return JSONResponse(status_code=settings.error_status,
+                            content={"error": {"message": "mock upstream error", "type": "server_error"}})
+
+    prompt = prompt_text(body)
+    text = reply_for(prompt)
+    usage = {"prompt_tokens": count_tokens(prompt), "completion_tokens": count_tokens(text)}
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    ttft = max(settings.ttft + random.uniform(-settings.ttft_jitter, settings.ttft_jitter), 0)
+    step = max(settings.chunk_tokens, 1)
+    delay = step / settings.tps if settings.tps > 0 else 0
+
+    if not body.get("stream"):
+        await asyncio.sleep(ttft + count_tokens(text) * delay / step)
+        return {"id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage}
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    async def stream():
+        await asyncio.sleep(ttft)
+        yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+        for i in range(0, len(text), step):
+            yield chunk(completion_id, model, {"content": text[i:i + step]})
+            if delay:
+                await asyncio.sleep(delay)
+        yield chunk(completion_id, model, {}, finish="stop")
+        if include_usage:
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": model, "choices": [], "usage": usage}
+            yield f"data: {json.dumps(payload)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的模拟大模型服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--ttft", type=float, default=settings.ttft, help="首字延迟（秒）")
+    parser.add_argument("--ttft-jitter", type=float, default=settings.ttft_jitter, help="首字延迟随机波动（秒）")
+    parser.add_argument("--tps", type=float, default=settings.tps, help="生成速度（token/秒），<=0 不限速")
+    parser.add_argument("--chunk-tokens", type=int, default=settings.chunk_tokens, help="每个流式分块的 token 数")
+    parser.add_argument("--error-rate", type=float, default=settings.error_rate, help="随机错误概率（0~1）")
+    parser.add_argument("--error-status", type=int, default=settings.error_status, help="错误时返回的 HTTP 状态码")
+    parser.add_argument("--tokens", type=int, default=settings.tokens, help="默认回复的 token 数")
+    parser.add_argument("--classes", default=settings.classes, help="专业分类请求返回的专业类")
+    parser.add_argument("--script", help="脚本化回复的 JSON 文件：[{\"match\": 正则, \"response\": 回复}]")
+    args = parser.parse_args()
+
+    settings.ttft, settings.ttft_jitter, settings.tps = args.ttft, args.ttft_jitter, args.tps
+    settings.chunk_tokens, settings.error_rate, settings.error_status = args.chunk_tokens, args.error_rate, args.error_status
+    settings.tokens, settings.classes = args.tokens, args.classes
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            settings.script = json.load(f)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
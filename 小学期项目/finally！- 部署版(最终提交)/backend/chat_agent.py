@@ -12,15 +12,13 @@ from langchain_community.agent_toolkits import create_sql_agent
 from langchain_community.chat_models import ChatZhipuAI
 from langchain_community.utilities import SQLDatabase, SerpAPIWrapper
 
-import math
-from langchain_openai import ChatOpenAI
-from openai import OpenAI
-from pydantic import SecretStr
 import re
 import json
-from collections import defaultdict
-from collections import defaultdict
-from decimal import Decimal
+
+import executor
+import llm_clients
+import llm_metrics
+from recommend_engine import build_tiers
 
 
 # 加载环境变量
@@ -46,75 +44,49 @@ db_configs = f"mysql+pymysql://{auth_part}@{host}:{port}/{database_college}"
 db = SQLDatabase.from_uri(database_uri=db_configs, sample_rows_in_table_info=3)
 
 result_json = {}
-secondary_llm = OpenAI(
-    api_key=os.environ['ZHIPU_API_KEY'],
-    base_url=os.environ['ZHIPU_BASE_URL'],
-)
-
-def group_by_school_min_score_sum_enroll(results):
-    """
-    results: List[Tuple]，每个元组格式为
-    (院校名称, 专业名称, 招生人数, 平均分, ...)
-    返回：List[Dict]，每个dict包含院校名称、总招生人数、最低平均分
-    """
-    school_data = defaultdict(lambda: {'招生人数': 0, '平均分':0})
-
-    for row in results:
-        school = row[0]
-        enroll = int(row[3])
-        avg_score = float(row[4])
-        school_data[school]['招生人数'] += enroll
-        if school_data[school]['平均分'] is None or avg_score >= school_data[school]['平均分']:
-            school_data[school]['平均分'] = avg_score
-
-    grouped = []
-    for school, data in school_data.items():
-        grouped.append({
-            '院校名称': school,
-            '总招生人数': data['招生人数'],
-            '平均分': data['平均分']
-        })
-    return grouped
-
-def split_to_chong_wen_bao(grouped_results, score):
-    """
-    grouped_results: List[Dict]，每个dict包含'院校名称'、'总招生人数'、'平均分'
-    score: float，考生分数
-    返回：冲、稳、保三组列表
-    """
-    chong, wen, bao = [], [], []
-    for item in grouped_results:
-        avg = item['平均分']
-        if avg > score:
-            chong.append(item)
-        elif score - 10 <= avg <= score:
-            wen.append(item)
-        else:
-            bao.append(item)
-    return chong, wen, bao
+secondary_llm = llm_clients.registry.openai("zhipu")
+secondary_llm_async = llm_clients.registry.async_openai("zhipu")
 
 def ask_llm(message):
-    return secondary_llm.chat.completions.create(
-        messages=[{"role": "user", "content": message}],
-        model='glm-4',
-        temperature=1
-    ).choices[0].message.content
-
-
-def calc_prob(item, score, mode):
-    avg = item['平均分']
-    enroll = item['总招生人数']
-    enroll = max(enroll, 1)  # 防止log(0)
-    if mode == 'chong':
-        prob = 40 - (avg - score) * 4 + math.log(enroll) * 2
-        prob = max(prob, 20)
-    elif mode == 'wen':
-        prob = 60 + (score - avg) * 4 + math.log(enroll) * 2
-        prob = min(prob, 90)
-    else:  # bao
-        prob = 90 + (score - avg) * 0.5 + math.log(enroll) * 1
-        prob = min(prob, 99)
-    return round(prob, 1)
+    with llm_metrics.track("chat_agent.ask_llm", "glm-4") as call:
+        response = secondary_llm.chat.completions.create(
+            messages=[{"role": "user", "content": message}],
+            model='glm-4',
+            temperature=1
+        )
+        call.usage(response.usage)
+    return response.choices[0].message.content
+
+
+async def ask_llm_async(message):
+    # agent 异步执行时使用，不阻塞事件循环
+    async with executor.limit("llm"):
+        with llm_metrics.track("chat_agent.ask_llm", "glm-4") as call:
+            response = await secondary_llm_async.chat.completions.create(
+                messages=[{"role": "user", "content": message}],
+                model='glm-4',
+                temperature=1
+            )
+            call.usage(response.usage)
+    return response.choices[0].message.content
+
+
+def query_rows(sql):
+    """在 tianjin 库上执行一条查询，返回全部结果（同步，需经 executor 调用）"""
+    connection = pymysql.connect(
+        host=config['database']['host'],
+        database=config['database']['database_college'],
+        user=config['database']['user'],
+        password=config['database']['password'],
+        charset='utf8mb4'
+    )
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall()
+    finally:
+        connection.close()
+
 
 def extract_pure_sql(text):
     """
@@ -159,12 +131,7 @@ class DeepSeekChatService:
         try:
 
             # 创建大模型
-            self.llm = ChatOpenAI(
-                model="deepseek-chat",
-                base_url=os.environ['DEEPSEEK_BASE_URL'],
-                api_key=SecretStr(os.environ['DEEPSEEK_API_KEY']),
-                temperature=0.5
-            )
+            self.llm = llm_clients.get_chat_model("deepseek", "deepseek-chat", temperature=0.5)
 
             # 创建 agent
             self.agents = create_sql_agent(
@@ -179,6 +146,7 @@ class DeepSeekChatService:
                 Tool(
                     name="CollegeDB",
                     func=self.agents.run,
+                    coroutine=self.run_sql_agent,
                     description="查询全国学校招生计划信息(包括院校所在地、院校专业组代码、院校名称、专业名称、计划数、收费标准等)（表tianjin_enrollment_plan）、"
                                 "招生分数线(包含院校专业组代码、该专业组代码所需要的最低分等信息，只有分数信息没有其他信息，如所在城市等请去其他表查询)(表tianjin_college_admission)、"
                                 "学科评估结果(包含类别、学科、校名、评选结果等)(表subject_assessment)、"
@@ -201,6 +169,7 @@ class DeepSeekChatService:
                 Tool(
                     name="ClaudeExpert",
                     func=ask_llm,
+                    coroutine=ask_llm_async,
                     description="调用 glm-4 回答复杂问题或需要大模型分析的任务",
                 )
             ]
@@ -234,9 +203,15 @@ class DeepSeekChatService:
         except Exception as e:
                 raise e
 
+    async def run_sql_agent(self, query: str) -> str:
+        # CollegeDB 工具的异步实现，同时执行的 SQL agent 数受限
+        async with executor.limit("sql_agent"):
+            result = await self.agents.ainvoke({"input": query}, config=llm_metrics.site("chat_agent.sql_agent"))
+        return result.get("output", "") if isinstance(result, dict) else str(result)
+
     async def get_sql(self, message: str)->str:
         # 直接执行，不使用流式输出
-        result = await self.agent_executor.ainvoke({"input": message})
+        result = await self.agent_executor.ainvoke({"input": message}, config=llm_metrics.site("chat_agent.get_sql"))
         # 提取输出内容
         if isinstance(result, dict):
             output = result.get("output", "")
@@ -248,42 +223,13 @@ class DeepSeekChatService:
 
     async def chat(self,message:str,score):
         sql=await self.get_sql(message=message)
-        db_config = {
-            'host': config['database']['host'],
-            'database': config['database']['database_college'],
-            'user': config['database']['user'],
-            'password': config['database']['password'],
-            'charset': 'utf8mb4'
-        }
-        connection = pymysql.connect(**db_config)
-        with connection.cursor() as cursor:
-            fix=fix_sql_parentheses(sql)
-            print(fix)
-            cursor.execute(fix)
-            results = cursor.fetchall()
-            grouped_results = group_by_school_min_score_sum_enroll(results)
-            chong, wen, bao = split_to_chong_wen_bao(grouped_results, score)
-            # 3. 输出结果
-            # 只保留每档前5个
-            chong_top5 = chong[:5]
-            wen_top5 = wen[:5]
-            bao_top5 = bao[:5]
-
-            # 计算录取概率并添加到每个院校
-            for item in chong_top5:
-                item['录取概率'] = f"{calc_prob(item, score, 'chong')}%"
-            for item in wen_top5:
-                item['录取概率'] = f"{calc_prob(item, score, 'wen')}%"
-            for item in bao_top5:
-                item['录取概率'] = f"{calc_prob(item, score, 'bao')}%"
-
-            global result_json
-            result_json = {
-                "冲一冲": chong_top5,
-                "稳一稳": wen_top5,
-                "保一保": bao_top5
-            }
-            return json.dumps(result_json, ensure_ascii=False, indent=2)
+        fix=fix_sql_parentheses(sql)
+        print(fix)
+        results = await executor.run_blocking("mysql", query_rows, fix)
+        # 每档保留前5所院校，并计算录取概率
+        global result_json
+        result_json = build_tiers(results, score)
+        return json.dumps(result_json, ensure_ascii=False, indent=2)
 
 async def get():
     return json.dumps(result_json, ensure_ascii=False, indent=2)
\ No newline at end of file
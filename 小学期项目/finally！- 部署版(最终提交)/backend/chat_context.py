@@ -0,0 +1,161 @@
+"""
+推荐对话的上下文组装：在 token 预算内拼接 学生画像 + 推荐结果（固定前缀）、较早对话的摘要、最近几轮原文
+- 前缀在同一会话内保持不变，服务商的前缀缓存（prompt cache）可以命中
+- 较早的对话按 recent_turns 轮为一块滚动进摘要，摘要只在跨过块边界时变化，并按内容缓存
+- 摘要未就绪时先用截断的抽取式摘要，同时在后台调用LLM生成，下一轮即可使用，不增加首字延迟
+"""
+import asyncio
+import configparser
+import hashlib
+import json
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from analysis_cache import TTLCache
+from llm_metrics import site
+
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+_CJK = re.compile(r"[　-〿一-鿿＀-￯]")
+
+SUMMARY_PROMPT = """请把下面的高考志愿咨询对话压缩成不超过{limit}字的中文摘要，保留学生关心的院校、专业、分数和已给出的结论：
+{text}"""
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 token 数：中文字符每个计 1 个，其余字符约 4 个计 1 个（偏保守）"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def compact_json(text: str) -> str:
+    """推荐结果是带缩进的 JSON 字符串，去掉缩进可以省下不少 token"""
+    try:
+        return json.dumps(json.loads(text), ensure_ascii=False, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return text
+
+
+def truncate_recommendation(text: str, limit: int) -> str:
+    """
+    把推荐结果截到 limit 个 token 以内：分档 JSON（档名 -> 院校列表）从最长的一档末尾逐条删除，
+    其他文本按字符截断；删掉的条数写进“说明”，让模型知道结果不完整
+    """
+    if estimate_tokens(text) <= limit:
+        return text
+    try:
+        tiers = json.loads(text)
+    except (TypeError, ValueError):
+        tiers = None
+    if isinstance(tiers, dict) and tiers and all(isinstance(v, list) for v in tiers.values()):
+        dropped, truncated = 0, text
+        while any(tiers.values()):
+            longest = max(tiers, key=lambda name: len(tiers[name]))
+            tiers[longest].pop()
+            dropped += 1
+            payload = dict(tiers, 说明=f"推荐结果过长，已省略{dropped}条")
+            truncated = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+            if estimate_tokens(truncated) <= limit:
+                return truncated
+        text = truncated
+    # 非分档结果（或删空了仍超出）：按比例缩短直到不超过 limit
+    marker = "…（推荐结果过长，已截断）"
+    end = len(text)
+    while end > 0 and estimate_tokens(text[:end] + marker) > limit:
+        end = min(end - 1, end * max(limit, 0) // max(estimate_tokens(text[:end] + marker), 1))
+    return text[:max(end, 0)] + marker
+
+
+class ChatContextBuilder:
+    def __init__(self, budget: int = 3000, recent_turns: int = 4, summary_tokens: int = 300, llm=None):
+        self.budget = budget
+        self.recent_turns = max(recent_turns, 1)
+        self.summary_tokens = summary_tokens
+        self.llm = llm
+        self.summaries = TTLCache(maxsize=1024, ttl=6 * 3600)
+        self._pending = {}
+
+    def build(self, profile: str, recommendation: str, history: Sequence, message: str) -> List[BaseMessage]:
+        # 前缀计入预算：画像 + 推荐结果超出时截断推荐结果，至少留出 summary_tokens 给问题和对话
+        # 截断只取决于画像和推荐结果，同一会话内前缀保持不变
+        profile_tokens = estimate_tokens(profile)
+        recommendation = truncate_recommendation(compact_json(recommendation),
+                                                 self.budget - profile_tokens - self.summary_tokens)
+        prefix = [HumanMessage(content=profile), AIMessage(content=recommendation)]
+        turns = [(str(h[0]), str(h[1])) for h in history]
+
+        # 块边界：较早的轮数取 recent_turns 的整数倍，使摘要在若干轮内保持不变
+        split = max(len(turns) - self.recent_turns, 0)
+        split -= split % self.recent_turns
+
+        # 扣除前缀和当前问题后，剩余的预算才用于摘要和最近几轮原文
+        available = self.budget - profile_tokens - estimate_tokens(recommendation) - estimate_tokens(message)
+        used = self.summary_tokens if split else 0
+        # 超出预算时，按块把较早的原文轮次并入摘要（至少保留最近一轮）
+        costs = [estimate_tokens(q) + estimate_tokens(a) for q, a in turns]
+        while split < len(turns) - 1 and used + sum(costs[split:]) > available:
+            if not split:
+                used += self.summary_tokens
+            split = min(split + self.recent_turns - split % self.recent_turns, len(turns) - 1)
+        recent = turns[split:]
+
+        messages = list(prefix)
+        if split:
+            summary = self.summary(profile, turns[:split])
+            messages.append(HumanMessage(content=f"（此前对话摘要）{summary}"))
+            messages.append(AIMessage(content="好的，我会结合之前的对话继续回答。"))
+        for question, answer in recent:
+            messages.append(HumanMessage(content=question))
+            messages.append(AIMessage(content=answer))
+        messages.append(HumanMessage(content=message))
+        return messages
+
+    def summary(self, profile: str, turns: List[Tuple[str, str]]) -> str:
+        """返回较早对话的摘要：有缓存用缓存，否则返回抽取式摘要并在后台生成LLM摘要"""
+        key = hashlib.sha256(json.dumps([profile, turns], ensure_ascii=False).encode("utf-8")).hexdigest()
+        cached = self.summaries.get(key)
+        if cached is not None:
+            return cached
+        text = self._extractive(turns)
+        if self.llm is not None and key not in self._pending:
+            try:
+                task = asyncio.get_running_loop().create_task(self._summarize(key, turns))
+            except RuntimeError:
+                return text
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return text
+
+    def _extractive(self, turns: List[Tuple[str, str]]) -> str:
+        """每轮截取问答开头，从最近的轮次往前取，直到用完摘要预算"""
+        parts, used = [], 0
+        for question, answer in reversed(turns):
+            part = f"问：{question[:60]} 答：{answer[:120]}"
+            cost = estimate_tokens(part)
+            if used + cost > self.summary_tokens:
+                break
+            parts.append(part)
+            used += cost
+        return "；".join(reversed(parts))
+
+    async def _summarize(self, key: str, turns: List[Tuple[str, str]]):
+        text = "\n".join(f"学生：{q}\n助手：{a}" for q, a in turns)
+        try:
+            response = await self.llm.ainvoke(SUMMARY_PROMPT.format(limit=self.summary_tokens, text=text),
+                                              config=site("chatback.summary"))
+            self.summaries.set(key, response.content)
+        except Exception:
+            # 摘要失败不影响对话，下次仍使用抽取式摘要
+            pass
+
+
+def builder_from_config(llm: Optional[object] = None) -> ChatContextBuilder:
+    return ChatContextBuilder(
+        budget=config.getint('chat', 'context_budget', fallback=3000),
+        recent_turns=config.getint('chat', 'recent_turns', fallback=4),
+        summary_tokens=config.getint('chat', 'summary_tokens', fallback=300),
+        llm=llm,
+    )
@@ -2,14 +2,17 @@ import dotenv
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, SecretStr
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage,AIMessage
+from pydantic import BaseModel
 import json
-import os
+import time
 import uvicorn
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 import get_schools_agents
+import llm_clients
+from chat_context import builder_from_config
+from llm_metrics import site
+from llm_router import router_from_config
+from semantic_cache import chat_cache, chat_cache_enabled
 import logging
 
 # 配置日志
@@ -33,40 +36,50 @@ class ChatRequest(BaseModel):
     message: str
     max_tokens: int = 1000
     history: list = []
+    # 是否使用近似问题缓存，不传时取 config.ini 中的 chat_semantic_enabled
+    semantic_cache: Optional[bool] = None
 
 
 class DeepSeekChatService:
     def __init__(self):
         try:
-            self.chat_model = ChatOpenAI(
-                model="deepseek-chat",
-                base_url=os.environ["DEEPSEEK_BASE_URL"],
-                api_key=SecretStr(os.environ["DEEPSEEK_API_KEY"]),
-                temperature=0.3,
-                streaming=True
-            )
+            # 按 [router] chat 在多个服务商之间对冲和切换
+            self.chat_model = router_from_config("chat", temperature=0.3, streaming=True)
+            # 按 token 预算组装上下文，较早的对话用非流式模型在后台压缩成摘要
+            self.context_builder = builder_from_config(
+                llm_clients.get_chat_model("deepseek", "deepseek-chat", temperature=0.3))
             logger.info("DeepSeek ChatModel initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize DeepSeek ChatModel: {e}")
             raise
 
-    async def stream_chat(self, message: str,history: list) -> AsyncGenerator[str, None]:
+    async def stream_chat(self, message: str,history: list,
+                          use_cache: Optional[bool] = None) -> AsyncGenerator[str, None]:
         """流式生成聊天响应"""
         try:
-            # 创建消息a
-            messages = []
-            strs=str(get_schools_agents.get_student())
-            messages.append(HumanMessage(content=strs))
+            strs=await get_schools_agents.get_student()
             return_results=await get_schools_agents.return_result()
-            messages.append(AIMessage(content = return_results))  # 需要从langchain_core.messages导入AIMessage
-            for h in history:
-                messages.append(HumanMessage(content=h[0]))
-                messages.append(AIMessage(content=h[1]))  # 需要从langchain_core.messages导入AIMessage
-            messages.append(HumanMessage(content=message))
+
+            # 同一画像、同一推荐结果、同样的对话历史下的近似问题直接回放缓存的回答
+            use_cache = chat_cache_enabled if use_cache is None else use_cache
+            context = chat_cache.context_key(strs, str(return_results), history)
+            if use_cache:
+                cached = chat_cache.lookup(context, message)
+                if cached is not None:
+                    for content in cached.chunks:
+                        yield f"data: {json.dumps({'type': 'content', 'content': content}, ensure_ascii=False)}\n\n"
+                    end_data = {"type": "end", "content": ""}
+                    yield f"data: {json.dumps(end_data, ensure_ascii=False)}\n\n"
+                    return
+            # 固定前缀（画像 + 推荐结果）+ 较早对话摘要 + 最近几轮原文，总量不超过 token 预算
+            messages = self.context_builder.build(strs, str(return_results), history, message)
 
             # 流式调用
-            async for chunk in self.chat_model.astream(messages):
+            start = time.perf_counter()
+            chunks = []
+            async for chunk in self.chat_model.astream(messages, config=site("chatback.stream_chat")):
                 if chunk.content:
+                    chunks.append(chunk.content)
                     # 构造SSE格式数据
                     data = {
                         "type": "content",
@@ -74,6 +87,9 @@ class DeepSeekChatService:
                     }
                     yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
 
+            if use_cache and chunks:
+                chat_cache.store(context, message, chunks, time.perf_counter() - start)
+
             # 发送结束信号
             end_data = {"type": "end", "content": ""}
             yield f"data: {json.dumps(end_data, ensure_ascii=False)}\n\n"
@@ -100,7 +116,7 @@ async def stream_chat(request: ChatRequest):
     """流式聊天端点"""
     try:
         return StreamingResponse(
-            chat_service.stream_chat(request.message,request.history),
+            chat_service.stream_chat(request.message,request.history,request.semantic_cache),
             media_type="text/plain",
             headers={
                 "Cache-Control": "no-cache",
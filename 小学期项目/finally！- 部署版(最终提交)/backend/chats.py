@@ -1,10 +1,8 @@
-import os
+import executor
+import llm_clients
+import llm_metrics
 
-from dotenv import load_dotenv
-from openai import OpenAI
-load_dotenv()
-
-client = OpenAI(api_key=os.environ['DEEPSEEK_API_KEY'], base_url="https://api.deepseek.com")
+client = llm_clients.registry.async_openai("deepseek_official")
 
 messages=[
         {"role": "system", "content": "你是一个严格遵循规则的高考志愿推荐专家。"},
@@ -14,10 +12,14 @@ messages=[
 async def chat(question):
     messages.append({"role": "user", "content":question})
 
-    response = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=messages,
-        stream = False
-    ).choices[0].message.content
-    messages.append({"role": "assistance", "content": response})
-    return (response.choices[0].message.content)
\ No newline at end of file
+    async with executor.limit("llm"):
+        with llm_metrics.track("chats.chat", "deepseek-chat") as call:
+            response = await client.chat.completions.create(
+                model="deepseek-chat",
+                messages=messages,
+                stream = False
+            )
+            call.usage(response.usage)
+    content = response.choices[0].message.content
+    messages.append({"role": "assistant", "content": content})
+    return content
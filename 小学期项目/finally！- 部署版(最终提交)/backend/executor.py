@@ -0,0 +1,52 @@
+"""
+阻塞调用的执行层：同步的数据库查询、同步 SDK 调用放到有界线程池中执行，不再阻塞事件循环
+每类资源有独立的并发上限，某一类资源慢（如推荐SQL）时不会占满线程池、拖慢其他请求
+
+用法：
+    rows = await executor.run_blocking("mysql", query_rows, sql)
+    async with executor.limit("llm"):
+        await client.chat.completions.create(...)
+"""
+import asyncio
+import configparser
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+# 资源 -> 默认并发上限，可在 config.ini 的 [executor] 中覆盖
+DEFAULT_LIMITS = {
+    "mysql": 8,       # tianjin / mbti 库的查询
+    "user_db": 1,     # password.py 共用一个 pymysql 连接，必须串行
+    "sql_agent": 4,   # 生成推荐SQL的 agent，单次耗时长
+    "llm": 16,        # 直接调用的大模型接口
+    "response_cache": 4,  # 本地 sqlite 响应缓存
+}
+
+_pool = ThreadPoolExecutor(
+    max_workers=config.getint('executor', 'max_workers', fallback=16),
+    thread_name_prefix="blocking",
+)
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def limit(resource: str) -> asyncio.Semaphore:
+    """资源对应的信号量，原生协程调用也用它限流"""
+    if resource not in _semaphores:
+        size = config.getint('executor', resource, fallback=DEFAULT_LIMITS.get(resource, 4))
+        _semaphores[resource] = asyncio.Semaphore(size)
+    return _semaphores[resource]
+
+
+async def run_blocking(resource: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """在线程池中执行同步函数，同一资源的并发数不超过上限"""
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    async with limit(resource):
+        return await asyncio.get_running_loop().run_in_executor(_pool, call)
+
+
+def shutdown():
+    _pool.shutdown(wait=False, cancel_futures=True)
@@ -1,13 +1,23 @@
+import asyncio
+import configparser
 import json
 import time
 
 from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 import MBTIseek
 import chat_agent
+import recommend_engine
+import recommend_index
 
 load_dotenv()
 
+config = configparser.ConfigParser()
+config.read('config.ini')
+# index：内存列式索引（默认）；sql：预置的参数化SQL；agent：由大模型编写SQL（旧流程，需数十秒）
+recommend_mode = config.get('recommend', 'engine', fallback='index')
+
 chat_service = chat_agent.DeepSeekChatService()
 
 live_city = ""
@@ -66,6 +76,21 @@ def seek(mbti_type):
     return {"status": "success", "message": "MBTI类型已更新", "MBTI": MBTI, "MBTI_career": MBTI_career}
 
 async def smart_recommend():
+    global result
+    if recommend_mode != "agent":
+        engine = recommend_index if recommend_mode == "index" else recommend_engine
+        tiers = await engine.recommend(score, strategy, subjects, want_major)
+        chat_agent.result_json = tiers
+        result = json.dumps(tiers, ensure_ascii=False, indent=2)
+        response = {"result": result, "time": time.time()}
+        if recommend_engine.narrative_enabled:
+            try:
+                response["narrative"] = await recommend_engine.narrate(tiers, score, strategy, want_major)
+            except Exception as e:
+                # 说明只是附加内容，生成失败不影响推荐结果
+                print(f"推荐说明生成失败: {e}")
+        return response
+
     subject_list = subjects.split(",")
     print(subject_list)
     prompt = f"""
@@ -177,12 +202,21 @@ async def smart_recommend():
 
 """
 
-    global result
     result = await chat_service.chat(prompt,score)
     print(result)
-    json= {"result":result,"time":time.time()}
-    print(json)
-    return json
+    response = {"result":result,"time":time.time()}
+    print(response)
+    return response
 
 async def return_result():
     return result
+
+
+async def reload_index():
+    """重新检查物化表、重新读取招生数据并重建推荐索引（更新数据库或刷新物化表后调用）"""
+    try:
+        recommend_engine.reset()
+        index = await asyncio.to_thread(recommend_index.reload_index)
+        return JSONResponse(content={"status": "success", "index": index.info()})
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
@@ -0,0 +1,344 @@
+"""
+知识图谱二进制格式：把 output_all.txt 编译成可 mmap 的紧凑文件
+文本文件仍是唯一数据源，二进制文件头里记录源文件的 sha256，源文件变化后旧的二进制文件会被拒绝
+
+文件布局（小端，各段按4字节对齐）：
+    头部          magic "KGB1" | 版本 | 源文件sha256 | 字符串数 | 四元组数 | 关系边数 | 保留
+    字符串表      偏移 uint32[字符串数+1] | utf-8 字节
+    四元组        int32[四元组数, 4]，每项是字符串表下标
+    出边 CSR      偏移 uint32[字符串数+1] | 目标 uint32[边数] | 谓词 uint32[边数]
+    入边 CSR      偏移 uint32[字符串数+1] | 来源 uint32[边数] | 谓词 uint32[边数]
+    主体 CSR      偏移 uint32[字符串数+1] | 四元组行号 uint32[四元组数]
+    名称索引      字符串下标 uint32[字符串数]，按 utf-8 字节排序，名称 -> 下标用二分查找
+
+mmap 打开后查询直接读这些数组，字符串按需解码，进程内不再展开四元组或建字典
+
+用法（在 backend 目录下运行）：
+    python kg_binary.py compile                      # output/output_all.txt -> output/output_all.kgb
+    python kg_binary.py compile --src a.txt --out a.kgb
+    python kg_binary.py info output/output_all.kgb
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+KG_TEXT_PATH = "output/output_all.txt"
+KG_BINARY_PATH = "output/output_all.kgb"
+
+MAGIC = b"KGB1"
+FORMAT_VERSION = 2
+_HEADER = struct.Struct("<4sI32sIIII")
+
+
+class StaleArtifactError(ValueError):
+    """二进制文件与源文本文件不一致（源文件已修改）"""
+
+
+def file_sha256(path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def load_kg_data(path: str = KG_TEXT_PATH) -> List[Tuple[str, ...]]:
+    """读取知识图谱四元组文件，每行格式为 (类型; 主体; 谓词; 客体)"""
+    kg_data = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or not line.startswith("("):
+                continue
+            line = line.strip("()")
+            parts = [p.strip() for p in line.split(";")]
+            if len(parts) >= 4:
+                kg_data.append(tuple(parts))
+    return kg_data
+
+
+def _pad4(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def _group(n_nodes: int, keys: np.ndarray):
+    """按 keys 分组：返回 (offsets, order)，order[offsets[i]:offsets[i+1]] 是键为 i 的位置，组内保持原始顺序"""
+    order = np.argsort(keys, kind="stable")
+    counts = np.bincount(keys, minlength=n_nodes)
+    offsets = np.zeros(n_nodes + 1, dtype=np.uint32)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, order
+
+
+def _csr(n_nodes: int, src: np.ndarray, dst: np.ndarray, rel: np.ndarray):
+    """按 src 分组生成 CSR：offsets[i]:offsets[i+1] 是节点 i 的邻居，组内保持原始顺序"""
+    offsets, order = _group(n_nodes, src)
+    return offsets, dst[order].astype(np.uint32), rel[order].astype(np.uint32)
+
+
+class CompiledKG:
+    """
+    整数化的知识图谱：字符串表 + 四元组下标 + 出/入边 CSR 邻接 + 按主体分组的四元组
+    可以由四元组在内存中构建，也可以从编译好的文件 mmap 打开（多个 worker 共享同一份页缓存）
+    """
+
+    def __init__(self, strings, quads: np.ndarray, out_csr, in_csr, subject_csr, source_hash: bytes,
+                 mm=None, sorted_ids: Optional[np.ndarray] = None):
+        self._strings = strings
+        self.quads = quads
+        self.out_offsets, self.out_targets, self.out_relations = out_csr
+        self.in_offsets, self.in_sources, self.in_relations = in_csr
+        self.subject_offsets, self.subject_rows = subject_csr
+        self.source_hash = source_hash
+        self._mm = mm
+        self._sorted_ids = sorted_ids
+        self._ids = None
+
+    # ---------- 构建 ----------
+    @classmethod
+    def from_quads(cls, kg_data, source_hash: bytes = b"") -> "CompiledKG":
+        ids = {}
+        strings = []
+
+        def intern(s):
+            i = ids.get(s)
+            if i is None:
+                i = ids[s] = len(strings)
+                strings.append(s)
+            return i
+
+        quads = np.array([[intern(p) for p in item[:4]] for item in kg_data], dtype=np.int32).reshape(-1, 4)
+        rel_type = ids.get("实体关系", -1)
+        edges = quads[quads[:, 0] == rel_type] if len(quads) else quads
+        src = edges[:, 1].astype(np.int64)
+        dst = edges[:, 3].astype(np.int64)
+        rel = edges[:, 2].astype(np.int64)
+        subject_offsets, subject_rows = _group(len(strings), quads[:, 1].astype(np.int64))
+        graph = cls(strings, quads, _csr(len(strings), src, dst, rel), _csr(len(strings), dst, src, rel),
+                    (subject_offsets, subject_rows.astype(np.uint32)), source_hash)
+        graph._ids = ids
+        return graph
+
+    @classmethod
+    def from_text(cls, path: str = KG_TEXT_PATH) -> "CompiledKG":
+        return cls.from_quads(load_kg_data(path), file_sha256(path))
+
+    # ---------- 读写 ----------
+    def write(self, path: str):
+        encoded = [s.encode("utf-8") for s in self._all_strings()]
+        str_offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+        np.cumsum([len(b) for b in encoded], out=str_offsets[1:])
+        blob = b"".join(encoded)
+        n_edges = len(self.out_targets)
+        sorted_ids = np.array(sorted(range(len(encoded)), key=encoded.__getitem__), dtype="<u4")
+        sections = [
+            str_offsets.tobytes(), blob,
+            self.quads.astype("<i4").tobytes(),
+            self.out_offsets.astype("<u4").tobytes(), self.out_targets.astype("<u4").tobytes(),
+            self.out_relations.astype("<u4").tobytes(),
+            self.in_offsets.astype("<u4").tobytes(), self.in_sources.astype("<u4").tobytes(),
+            self.in_relations.astype("<u4").tobytes(),
+            self.subject_offsets.astype("<u4").tobytes(), self.subject_rows.astype("<u4").tobytes(),
+            sorted_ids.tobytes(),
+        ]
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, self.source_hash.ljust(32, b"\0"),
+                                 len(encoded), len(self.quads), n_edges, 0))
+            for section in sections:
+                f.write(section)
+                f.write(b"\0" * (_pad4(len(section)) - len(section)))
+        # 先写临时文件再替换，正在读取旧文件的进程不受影响
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path: str = KG_BINARY_PATH, source_path: Optional[str] = KG_TEXT_PATH) -> "CompiledKG":
+        """mmap 打开编译好的文件；给出 source_path 时校验源文件哈希，不一致抛出 StaleArtifactError"""
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, source_hash, n_strings, n_quads, n_edges, _ = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            mm.close()
+            raise ValueError(f"{path} 不是知识图谱二进制文件")
+        if version != FORMAT_VERSION:
+            mm.close()
+            raise StaleArtifactError(f"{path} 的格式版本为 {version}（当前为 {FORMAT_VERSION}），"
+                                     f"请重新运行 python kg_binary.py compile")
+        if source_path is not None and file_sha256(source_path) != source_hash:
+            mm.close()
+            raise StaleArtifactError(f"{path} 与 {source_path} 不一致，请重新运行 python kg_binary.py compile")
+
+        offset = _HEADER.size
+
+        def take(dtype, count):
+            nonlocal offset
+            arr = np.frombuffer(mm, dtype=dtype, count=count, offset=offset)
+            offset += _pad4(arr.nbytes)
+            return arr
+
+        str_offsets = take("<u4", n_strings + 1)
+        blob = memoryview(mm)[offset:offset + int(str_offsets[-1])]
+        offset += _pad4(int(str_offsets[-1]))
+        quads = take("<i4", n_quads * 4).reshape(-1, 4)
+        out_csr = (take("<u4", n_strings + 1), take("<u4", n_edges), take("<u4", n_edges))
+        in_csr = (take("<u4", n_strings + 1), take("<u4", n_edges), take("<u4", n_edges))
+        subject_csr = (take("<u4", n_strings + 1), take("<u4", n_quads))
+        sorted_ids = take("<u4", n_strings)
+        return cls(_MappedStrings(str_offsets, blob), quads, out_csr, in_csr, subject_csr, source_hash, mm,
+                   sorted_ids)
+
+    # ---------- 查询 ----------
+    def __len__(self):
+        return len(self._strings)
+
+    def _all_strings(self) -> List[str]:
+        return [self._strings[i] for i in range(len(self._strings))]
+
+    def string(self, i: int) -> str:
+        return self._strings[i]
+
+    def id_of(self, name: str) -> Optional[int]:
+        """名称 -> 字符串下标；mmap 打开时在名称索引上二分查找，不建字典"""
+        if self._ids is not None:
+            return self._ids.get(name)
+        if self._sorted_ids is None:
+            self._ids = {s: i for i, s in enumerate(self._all_strings())}
+            return self._ids.get(name)
+        key = name.encode("utf-8")
+        sorted_ids, encoded = self._sorted_ids, self._strings.encoded
+        lo, hi = 0, len(sorted_ids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if encoded(sorted_ids[mid]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(sorted_ids) and encoded(sorted_ids[lo]) == key:
+            return int(sorted_ids[lo])
+        return None
+
+    def out_edges(self, i: int):
+        """节点 i 的出边：(目标下标数组, 谓词下标数组)"""
+        start, end = self.out_offsets[i], self.out_offsets[i + 1]
+        return self.out_targets[start:end], self.out_relations[start:end]
+
+    def in_edges(self, i: int):
+        """节点 i 的入边：(来源下标数组, 谓词下标数组)"""
+        start, end = self.in_offsets[i], self.in_offsets[i + 1]
+        return self.in_sources[start:end], self.in_relations[start:end]
+
+    def quads_of(self, i: int) -> np.ndarray:
+        """主体为节点 i 的四元组下标，int32[n, 4]，保持源文件中的顺序"""
+        start, end = self.subject_offsets[i], self.subject_offsets[i + 1]
+        return self.quads[self.subject_rows[start:end]]
+
+    def decode(self, row) -> Tuple[str, ...]:
+        return tuple(self._strings[j] for j in row)
+
+    def to_quads(self) -> List[Tuple[str, str, str, str]]:
+        strings = self._all_strings()
+        return [tuple(strings[j] for j in row) for row in self.quads.tolist()]
+
+    def info(self) -> dict:
+        return {
+            "strings": len(self._strings),
+            "quadruples": len(self.quads),
+            "edges": len(self.out_targets),
+            "source_sha256": self.source_hash.hex(),
+            "mmap": self._mm is not None,
+        }
+
+
+class _MappedStrings:
+    """mmap 中的字符串表，按需解码"""
+
+    def __init__(self, offsets: np.ndarray, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.encoded(i).decode("utf-8")
+
+    def encoded(self, i: int) -> bytes:
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]])
+
+
+class NodeView(Mapping):
+    """
+    以节点名称为键的只读映射，值在查询时由 CSR 数组按下标现算，进程内不保存展开后的数据
+    keys: 属于该映射的字符串下标（升序）；value: 下标 -> 值
+    """
+
+    def __init__(self, graph: CompiledKG, keys: np.ndarray, value: Callable[[int], object]):
+        self._graph = graph
+        self._keys = np.asarray(keys, dtype=np.int64)
+        self._value = value
+
+    def _key_id(self, name) -> Optional[int]:
+        i = self._graph.id_of(name) if isinstance(name, str) else None
+        if i is None:
+            return None
+        pos = int(np.searchsorted(self._keys, i))
+        return i if pos < len(self._keys) and self._keys[pos] == i else None
+
+    def __getitem__(self, name):
+        i = self._key_id(name)
+        if i is None:
+            raise KeyError(name)
+        return self._value(i)
+
+    def get(self, name, default=None):
+        i = self._key_id(name)
+        return default if i is None else self._value(i)
+
+    def __contains__(self, name) -> bool:
+        return self._key_id(name) is not None
+
+    def __iter__(self):
+        return (self._graph.string(i) for i in self._keys.tolist())
+
+    def items(self):
+        """按下标顺序产出 (名称, 值)，不再逐个按名称查找"""
+        return ((self._graph.string(i), self._value(i)) for i in self._keys.tolist())
+
+    def __len__(self):
+        return len(self._keys)
+
+
+def load_compiled_kg(binary_path: str = KG_BINARY_PATH, source_path: str = KG_TEXT_PATH) -> CompiledKG:
+    """优先打开与源文件一致的二进制文件，不存在时从文本构建；二进制文件过期时抛出 StaleArtifactError"""
+    if os.path.exists(binary_path):
+        return CompiledKG.open(binary_path, source_path)
+    return CompiledKG.from_text(source_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识图谱二进制编译工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compile_parser = sub.add_parser("compile", help="把四元组文本编译成二进制文件")
+    compile_parser.add_argument("--src", default=KG_TEXT_PATH)
+    compile_parser.add_argument("--out", default=KG_BINARY_PATH)
+    info_parser = sub.add_parser("info", help="查看二进制文件信息")
+    info_parser.add_argument("path", nargs="?", default=KG_BINARY_PATH)
+    info_parser.add_argument("--src", default=None, help="同时校验源文件哈希")
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        graph = CompiledKG.from_text(args.src)
+        graph.write(args.out)
+        print(f"已生成 {args.out}: {graph.info()}, {os.path.getsize(args.out)} 字节")
+    else:
+        print(CompiledKG.open(args.path, args.src).info())
+
+
+if __name__ == "__main__":
+    main()
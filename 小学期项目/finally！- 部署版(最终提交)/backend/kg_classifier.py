@@ -0,0 +1,90 @@
+"""
+本地专业类分类器：字符 n-gram TF-IDF + 余弦相似度，纯 NumPy 实现，不需要调用LLM
+每个专业类的文档由 专业类名称、专业类描述、所属学位授予门类、下属专业名称 拼成
+"""
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# 只保留汉字、字母和数字
+_NON_WORD = re.compile(r"[^一-鿿A-Za-z0-9]+")
+
+
+def char_ngrams(text: str, n_min: int = 1, n_max: int = 3) -> List[str]:
+    """按标点和空白切段后，在每段内取字符 n-gram"""
+    grams = []
+    for segment in _NON_WORD.split(text):
+        for n in range(n_min, n_max + 1):
+            grams.extend(segment[i:i + n] for i in range(len(segment) - n + 1))
+    return grams
+
+
+class LexicalClassifier:
+    """
+    classifier = LexicalClassifier({"计算机类": "计算机类 计算机科学与技术 软件工程 ...", ...})
+    classifier.classify(["我想学编程和软件"], k=3)
+    -> [[("计算机类", 0.41), ("电子信息类", 0.12), ...]]
+    """
+
+    def __init__(self, documents: Dict[str, str], n_min: int = 1, n_max: int = 3):
+        self.n_min, self.n_max = n_min, n_max
+        self.labels = list(documents)
+        counts = [Counter(char_ngrams(doc, n_min, n_max)) for doc in documents.values()]
+
+        self.vocab = {}
+        for counter in counts:
+            for gram in counter:
+                self.vocab.setdefault(gram, len(self.vocab))
+
+        n_docs = len(self.labels)
+        df = np.zeros(len(self.vocab), dtype=np.float32)
+        for counter in counts:
+            df[[self.vocab[g] for g in counter]] += 1
+        self.idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+
+        self.matrix = np.zeros((n_docs, len(self.vocab)), dtype=np.float32)
+        for row, counter in enumerate(counts):
+            cols = [self.vocab[g] for g in counter]
+            self.matrix[row, cols] = 1 + np.log(np.fromiter(counter.values(), dtype=np.float32))
+        self.matrix *= self.idf
+        self.matrix /= np.maximum(np.linalg.norm(self.matrix, axis=1, keepdims=True), 1e-12)
+
+    @classmethod
+    def from_kg(cls, kg_tool) -> "LexicalClassifier":
+        """由 KnowledgeGraphTool 的索引构建：专业类名称 + 描述 + 上级门类 + 下属专业"""
+        documents = {}
+        for name in sorted(kg_tool.profession_classes):
+            parts = [name, name.split('类')[0], kg_tool.entity_attrs.get(name, {}).get("专业类", "")]
+            parts.extend(kg_tool.parents.get(name, []))
+            parts.extend(kg_tool.children.get(name, []))
+            documents[name] = " ".join(parts)
+        return cls(documents)
+
+    def transform(self, texts: Sequence[str]) -> np.ndarray:
+        """把一批文本转成 L2 归一化的 TF-IDF 向量，词表外的 n-gram 忽略"""
+        vectors = np.zeros((len(texts), len(self.vocab)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counter = Counter(g for g in char_ngrams(text, self.n_min, self.n_max) if g in self.vocab)
+            if not counter:
+                continue
+            cols = [self.vocab[g] for g in counter]
+            vectors[row, cols] = (1 + np.log(np.fromiter(counter.values(), dtype=np.float32))) * self.idf[cols]
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+    def classify(self, texts: Sequence[str], k: int = 5) -> List[List[Tuple[str, float]]]:
+        """批量计算余弦相似度，返回每条文本的 top-k (专业类, 分数)，分数从高到低"""
+        if not texts:
+            return []
+        k = min(k, len(self.labels))
+        if k <= 0:
+            return [[] for _ in texts]
+        scores = self.transform(texts) @ self.matrix.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, cols in enumerate(top):
+            cols = cols[np.argsort(-scores[row, cols])]
+            results.append([(self.labels[c], round(float(scores[row, c]), 4)) for c in cols if scores[row, c] > 0])
+        return results
@@ -0,0 +1,73 @@
+from collections import deque
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+class MultiPatternMatcher:
+    """
+    Aho-Corasick 多模式匹配器
+    先 add 所有模式串（每个模式可以挂多个 payload），build 之后对文本只扫描一遍即可找出全部命中（包括重叠命中）
+
+    matcher = MultiPatternMatcher()
+    matcher.add("计算机", ("class", "计算机类"))
+    matcher.add("计算机科学与技术", ("major", "计算机科学与技术"))
+    matcher.build()
+    list(matcher.iter_matches("我想学计算机科学与技术"))
+    -> [(3, 6, "计算机", ("class", "计算机类")), (3, 11, "计算机科学与技术", ("major", "计算机科学与技术"))]
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每个状态结束的模式：[(模式串, payload), ...]
+        self._output: List[List[Tuple[str, Any]]] = [[]]
+        self._built = False
+
+    def __len__(self):
+        return sum(len(out) for out in self._output)
+
+    def add(self, pattern: str, payload: Any = None):
+        """添加一个模式串，build 之后不能再添加"""
+        if self._built:
+            raise RuntimeError("matcher 已经 build，不能再添加模式")
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append((pattern, payload))
+
+    def build(self) -> "MultiPatternMatcher":
+        """按广度优先计算失配指针，并把失配链上的输出合并到当前状态"""
+        # 第一层节点的失配指针都指向根
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str, Any]]:
+        """单次扫描文本，依次产出 (起始位置, 结束位置, 模式串, payload)"""
+        if not self._built:
+            self.build()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pattern, payload in output[state]:
+                yield i + 1 - len(pattern), i + 1, pattern, payload
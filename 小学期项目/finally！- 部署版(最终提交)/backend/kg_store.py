@@ -0,0 +1,74 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+import kg_binary
+from kg_binary import CompiledKG, StaleArtifactError
+from profession_annalysis3 import KnowledgeGraphTool
+
+logger = logging.getLogger(__name__)
+
+# 知识图谱源文件及编译后的二进制文件（相对 backend 目录）
+KG_PATH = kg_binary.KG_TEXT_PATH
+KG_BINARY_PATH = kg_binary.KG_BINARY_PATH
+
+
+class KGSnapshot:
+    """
+    知识图谱快照：整数化图谱 + 建在其上的 KnowledgeGraphTool
+    KnowledgeGraphTool 的索引直接读图谱的 CSR 数组和字符串表，二进制文件 mmap 打开时不再复制成 Python 对象
+    快照创建后只读，所有请求共享同一个对象；重新加载时整体替换，不在原对象上修改
+    """
+
+    def __init__(self, graph: CompiledKG, source: str = KG_PATH):
+        self.graph = graph
+        self.source = source
+        self.version = graph.source_hash.hex()[:12]
+        self.kg_tool = KnowledgeGraphTool(graph=graph)
+        self.loaded_at = time.time()
+
+    def info(self) -> dict:
+        return {
+            "source": self.source,
+            "version": self.version,
+            "quadruples": len(self.graph.quads),
+            "profession_classes": len(self.kg_tool.profession_classes),
+            "graph": self.graph.info(),
+            "loaded_at": self.loaded_at,
+        }
+
+
+def load_graph(path: str = KG_PATH, binary_path: str = KG_BINARY_PATH) -> CompiledKG:
+    """优先 mmap 打开编译好的二进制文件；文件不存在或已过期时从文本文件构建"""
+    try:
+        return kg_binary.load_compiled_kg(binary_path, path)
+    except StaleArtifactError as e:
+        logger.warning(f"拒绝使用过期的知识图谱二进制文件: {e}")
+        return CompiledKG.from_text(path)
+
+
+_snapshot: Optional[KGSnapshot] = None
+_lock = threading.Lock()
+
+
+def reload_snapshot(path: str = KG_PATH) -> KGSnapshot:
+    """重新读取知识图谱并原子替换当前快照，正在处理的请求继续使用旧快照"""
+    global _snapshot
+    with _lock:
+        start = time.perf_counter()
+        graph = load_graph(path)
+        snapshot = KGSnapshot(graph, source=path)
+        _snapshot = snapshot
+        logger.info(f"知识图谱快照已加载: version={snapshot.version}, "
+                    f"四元组={len(graph.quads)}, mmap={snapshot.graph.info()['mmap']}, "
+                    f"耗时={time.perf_counter() - start:.3f}s")
+    return snapshot
+
+
+def get_snapshot() -> KGSnapshot:
+    """获取当前快照，尚未加载时先加载"""
+    snapshot = _snapshot
+    if snapshot is None:
+        snapshot = reload_snapshot()
+    return snapshot
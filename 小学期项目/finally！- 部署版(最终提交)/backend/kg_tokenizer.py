@@ -0,0 +1,201 @@
+"""
+知识图谱专用的 jieba 分词器
+不再往全局 jieba 里逐个 add_word，而是把 jieba 默认词典和图谱实体合并，用独立的 jieba.Tokenizer 分词
+
+jieba 自带的缓存是 marshal 序列化的前缀词典（约50万个键），每个进程启动都要完整反序列化一遍（1秒以上），
+这里把前缀词典编译成可 mmap 的开放寻址哈希表，分词时按需查找，各 worker 共享同一份页缓存：
+    头部      magic "KGJ1" | 版本 | 总词频 | 词数 | 槽数
+    偏移      uint32[词数+1]，词的 utf-8 字节在字节区中的位置
+    词频      uint32[词数]，前缀词为 0（与 jieba 的前缀词典相同）
+    槽        uint32[槽数]，0 为空，否则为词下标+1；槽位为 crc32(词) 起线性探测
+    字节区    utf-8 字节
+文件按词表哈希命名，图谱不变时重启进程直接 mmap 打开；保存在用户缓存目录（[kg] tokenizer_cache_dir 可改），
+不写进项目目录，生成新词表的文件时删除旧词表留下的文件
+"""
+import configparser
+import glob
+import hashlib
+import io
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections.abc import Mapping
+from typing import Dict, Iterable
+
+import jieba
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+CACHE_DIR = config.get('kg', 'tokenizer_cache_dir', fallback='') or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "gaokao_kg", "jieba")
+# 本模块在缓存目录中生成的文件（含旧版的词典文本和 marshal 缓存），{key} 为词表哈希
+CACHE_PATTERNS = ("kg_jieba.{key}.pfx", "kg_dict.{key}.txt", "kg_userdict.{key}.txt", "kg_jieba.{key}.cache")
+# 与原来 jieba.add_word(entity, 10) 的词频一致
+KG_WORD_FREQ = 10
+
+MAGIC = b"KGJ1"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIQII")
+
+_tokenizers: Dict[str, jieba.Tokenizer] = {}
+_lock = threading.Lock()
+
+
+def kg_words(entities: Iterable[str]) -> list:
+    """图谱实体及其空格前的部分；含空白的词 jieba 无法整体切出，直接跳过"""
+    words = set()
+    for entity in entities:
+        for word in (entity, entity.split(" ")[0]):
+            if word and not any(ch.isspace() for ch in word):
+                words.add(word)
+    return sorted(words)
+
+
+def merged_dict(words: list) -> bytes:
+    """jieba 默认词典 + 图谱词（jieba 词典格式：词 词频），图谱词在后，重复的词以图谱词频为准"""
+    default_dict = jieba.Tokenizer().get_dict_file()
+    with default_dict:
+        data = default_dict.read()
+    if not data.endswith(b"\n"):
+        data += b"\n"
+    return data + "".join(f"{word} {KG_WORD_FREQ}\n" for word in words).encode("utf-8")
+
+
+def _place(hashes: np.ndarray, n_slots: int) -> np.ndarray:
+    """线性探测的批量插入：每轮把所有未放下的词放到各自的下一个候选槽，同一槽只放下标最小的词"""
+    slots = np.zeros(n_slots, dtype=np.uint32)
+    pending = np.arange(len(hashes), dtype=np.int64)
+    probe = hashes.astype(np.int64) & (n_slots - 1)
+    while len(pending):
+        candidate = probe[pending]
+        free = slots[candidate] == 0
+        _, first = np.unique(candidate[free], return_index=True)
+        placed = pending[free][first]
+        slots[probe[placed]] = placed + 1
+        pending = np.setdiff1d(pending, placed, assume_unique=True)
+        probe[pending] = (probe[pending] + 1) & (n_slots - 1)
+    return slots
+
+
+def compile_prefix_dict(dictionary: bytes, path: str):
+    """按 jieba 的规则生成前缀词典，写成可 mmap 的哈希表文件"""
+    freq, total = jieba.Tokenizer.gen_pfdict(io.BytesIO(dictionary))
+    encoded = [word.encode("utf-8") for word in freq]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    n_slots = 1 << max(4, (2 * len(encoded) - 1).bit_length())  # 装载率不超过 1/2
+    slots = _place(np.array([zlib.crc32(b) for b in encoded], dtype=np.uint32), n_slots)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, total, len(encoded), n_slots))
+        f.write(offsets.tobytes())
+        f.write(np.fromiter(freq.values(), dtype="<u4", count=len(freq)).tobytes())
+        f.write(slots.astype("<u4").tobytes())
+        f.write(b"".join(encoded))
+    # 先写临时文件再替换，多个 worker 同时构建时互不影响
+    os.replace(tmp_path, path)
+
+
+def prune_cache(cache_dir: str, keep: str):
+    """删除其他词表留下的缓存文件；正在被其他进程 mmap 的文件删除后映射仍然有效"""
+    for pattern in CACHE_PATTERNS:
+        for path in glob.glob(os.path.join(glob.escape(cache_dir), pattern.format(key="*"))):
+            if path.split(".")[-2] == keep:
+                continue
+            try:
+                os.remove(path)
+                logger.info(f"已删除过期的分词器缓存: {path}")
+            except OSError as e:
+                logger.warning(f"删除分词器缓存失败 {path}: {e}")
+
+
+class MappedPrefixDict(Mapping):
+    """mmap 中的前缀词典（词 -> 词频），用来替换 jieba.Tokenizer.FREQ，只读"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.total, n_words, n_slots = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} 不是受支持的前缀词典文件")
+        view = memoryview(self._mm)
+        start = _HEADER.size
+        self._offsets = view[start:start + 4 * (n_words + 1)].cast("I")
+        start += 4 * (n_words + 1)
+        self._freq = view[start:start + 4 * n_words].cast("I")
+        start += 4 * n_words
+        self._slots = view[start:start + 4 * n_slots].cast("I")
+        self._blob = view[start + 4 * n_slots:]
+        self._mask = n_slots - 1
+
+    def _find(self, word) -> int:
+        if not isinstance(word, str):
+            return -1
+        key = word.encode("utf-8")
+        slots, offsets, blob = self._slots, self._offsets, self._blob
+        slot = zlib.crc32(key) & self._mask
+        while True:
+            entry = slots[slot]
+            if not entry:
+                return -1
+            i = entry - 1
+            if blob[offsets[i]:offsets[i + 1]] == key:
+                return i
+            slot = (slot + 1) & self._mask
+
+    def __getitem__(self, word) -> int:
+        i = self._find(word)
+        if i < 0:
+            raise KeyError(word)
+        return self._freq[i]
+
+    def get(self, word, default=None):
+        i = self._find(word)
+        return default if i < 0 else self._freq[i]
+
+    def __contains__(self, word) -> bool:
+        return self._find(word) >= 0
+
+    def __iter__(self):
+        offsets, blob = self._offsets, self._blob
+        return (bytes(blob[offsets[i]:offsets[i + 1]]).decode("utf-8") for i in range(len(self)))
+
+    def __len__(self):
+        return len(self._freq)
+
+
+def build_tokenizer(entities: Iterable[str], cache_dir: str = CACHE_DIR) -> jieba.Tokenizer:
+    """
+    按图谱词表构建（或复用）分词器
+    前缀词典文件按词表哈希命名，图谱不变时重启进程只需 mmap 打开
+    """
+    words = kg_words(entities)
+    key = hashlib.sha256("\n".join(words).encode("utf-8")).hexdigest()[:16]
+    with _lock:
+        tokenizer = _tokenizers.get(key)
+        if tokenizer is not None:
+            return tokenizer
+
+        os.makedirs(cache_dir, exist_ok=True)
+        prefix_dict_path = os.path.join(cache_dir, f"kg_jieba.{key}.pfx")
+        if not os.path.exists(prefix_dict_path):
+            compile_prefix_dict(merged_dict(words), prefix_dict_path)
+        prune_cache(cache_dir, key)
+
+        # 直接换上 mmap 的前缀词典并标记为已初始化，jieba 不再读取词典或 marshal 缓存
+        freq = MappedPrefixDict(prefix_dict_path)
+        tokenizer = jieba.Tokenizer(dictionary=prefix_dict_path)
+        tokenizer.FREQ, tokenizer.total, tokenizer.initialized = freq, freq.total, True
+        _tokenizers.clear()
+        _tokenizers[key] = tokenizer
+        logger.info(f"知识图谱分词器已就绪: 词数={len(words)}, 前缀词典={prefix_dict_path}")
+        return tokenizer
@@ -0,0 +1,124 @@
+"""
+大模型响应的磁盘缓存（sqlite3）：按标准化后的 prompt 存储流式输出的全部分块，命中时原样回放
+支持 TTL 过期，并按最近访问时间淘汰，使条目数和总字节数不超过上限；进程重启后缓存仍然有效
+"""
+import configparser
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    chunks TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed);
+"""
+
+
+def prompt_key(model: str, prompt: str) -> str:
+    """标准化 prompt（合并空白、转小写）后与模型名一起取哈希"""
+    normalized = re.sub(r"\s+", " ", prompt).strip().lower()
+    return hashlib.sha256(f"{model}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_entries: int = 5000,
+                 max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # 首次使用时再打开数据库，导入模块不产生文件
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """返回缓存的分块列表，不存在或已过期时返回 None"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT chunks, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] + self.ttl > now:
+                conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return json.loads(row[0])
+            if row is not None:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+
+    def set(self, key: str, chunks: List[str]):
+        payload = json.dumps(chunks, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                         (key, payload, len(payload.encode("utf-8")), now, now))
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """先删过期条目，再按最近访问时间从旧到新删，直到满足条数和字节数上限"""
+        conn.execute("DELETE FROM responses WHERE created + ? <= ?", (self.ttl, now))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "size": count,
+                "bytes": total,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# 专业倾向解释的缓存：内容主要取决于识别出的专业类别，热门查询可直接回放
+explanation_cache = ResponseCache(
+    path=config.get('cache', 'explain_path', fallback='output/llm_cache.sqlite3'),
+    ttl=config.getfloat('cache', 'explain_ttl', fallback=7 * 24 * 3600),
+    max_entries=config.getint('cache', 'explain_max_entries', fallback=5000),
+    max_bytes=config.getint('cache', 'explain_max_bytes', fallback=50 * 1024 * 1024),
+)
@@ -0,0 +1,140 @@
+"""
+大模型客户端注册表：每个服务商只创建一套 keep-alive 连接池（同步 + 异步），所有调用点共享
+避免各模块各自创建客户端，重复建立 TLS 连接
+
+用法：
+    import llm_clients
+    chat_model = llm_clients.get_chat_model("deepseek", temperature=0.3, streaming=True)
+    client = llm_clients.registry.async_openai("zhipu")
+"""
+import configparser
+import os
+import threading
+from typing import Dict, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+from openai import AsyncOpenAI, OpenAI
+from pydantic import SecretStr
+
+from llm_metrics import metrics_handler
+
+load_dotenv()
+
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+# 服务商 -> (base_url 环境变量或固定地址, api_key 环境变量)
+PROVIDERS: Dict[str, Tuple[str, str]] = {
+    "deepseek": ("DEEPSEEK_BASE_URL", "DEEPSEEK_API_KEY"),
+    "deepseek_free": ("OPENAI_DEEPSEEK_BASE_URL_FREE", "OPENAI_DEEPSEEK_APIKEY_FREE"),
+    "zhipu": ("ZHIPU_BASE_URL", "ZHIPU_API_KEY"),
+    "deepseek_official": ("https://api.deepseek.com", "DEEPSEEK_API_KEY"),
+}
+
+
+def _setting(provider: str, key: str, fallback: float) -> float:
+    """读取 [llm] 配置，服务商专属配置（如 deepseek_max_connections）优先"""
+    return config.getfloat('llm', f"{provider}_{key}", fallback=config.getfloat('llm', key, fallback=fallback))
+
+
+class LLMClientRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._http: Dict[str, httpx.Client] = {}
+        self._async_http: Dict[str, httpx.AsyncClient] = {}
+        self._openai: Dict[str, OpenAI] = {}
+        self._async_openai: Dict[str, AsyncOpenAI] = {}
+        self._chat_models: Dict[tuple, ChatOpenAI] = {}
+
+    def credentials(self, provider: str) -> Tuple[str, str]:
+        base_url, api_key = PROVIDERS[provider]
+        if not base_url.startswith("http"):
+            base_url = os.environ[base_url]
+        return base_url, os.environ[api_key]
+
+    def timeout(self, provider: str) -> httpx.Timeout:
+        return httpx.Timeout(_setting(provider, "timeout", 120), connect=_setting(provider, "connect_timeout", 10))
+
+    def limits(self, provider: str) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=int(_setting(provider, "max_connections", 50)),
+            max_keepalive_connections=int(_setting(provider, "max_keepalive_connections", 20)),
+            keepalive_expiry=_setting(provider, "keepalive_expiry", 60),
+        )
+
+    def http_client(self, provider: str) -> httpx.Client:
+        with self._lock:
+            if provider not in self._http:
+                self._http[provider] = httpx.Client(timeout=self.timeout(provider), limits=self.limits(provider))
+            return self._http[provider]
+
+    def async_http_client(self, provider: str) -> httpx.AsyncClient:
+        with self._lock:
+            if provider not in self._async_http:
+                self._async_http[provider] = httpx.AsyncClient(timeout=self.timeout(provider),
+                                                               limits=self.limits(provider))
+            return self._async_http[provider]
+
+    def openai(self, provider: str) -> OpenAI:
+        """同步 OpenAI 兼容客户端（共享连接池）"""
+        if provider not in self._openai:
+            base_url, api_key = self.credentials(provider)
+            client = OpenAI(api_key=api_key, base_url=base_url, timeout=self.timeout(provider),
+                            http_client=self.http_client(provider))
+            self._openai.setdefault(provider, client)
+        return self._openai[provider]
+
+    def async_openai(self, provider: str) -> AsyncOpenAI:
+        """异步 OpenAI 兼容客户端（共享连接池）"""
+        if provider not in self._async_openai:
+            base_url, api_key = self.credentials(provider)
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=self.timeout(provider),
+                                 http_client=self.async_http_client(provider))
+            self._async_openai.setdefault(provider, client)
+        return self._async_openai[provider]
+
+    def chat_model(self, provider: str, model: str = "deepseek-chat", temperature: float = 0.3,
+                   streaming: bool = False, **kwargs) -> ChatOpenAI:
+        """LangChain ChatOpenAI，相同参数复用同一个实例，底层连接池按服务商共享；流式调用同时返回 token 用量"""
+        key = (provider, model, temperature, streaming, tuple(sorted(kwargs.items())))
+        if key not in self._chat_models:
+            base_url, api_key = self.credentials(provider)
+            chat_model = ChatOpenAI(
+                model=model,
+                base_url=base_url,
+                api_key=SecretStr(api_key),
+                temperature=temperature,
+                streaming=streaming,
+                stream_usage=streaming and config.getboolean('llm', f"{provider}_stream_usage", fallback=True),
+                callbacks=[metrics_handler],
+                request_timeout=self.timeout(provider),
+                http_client=self.http_client(provider),
+                http_async_client=self.async_http_client(provider),
+                **kwargs
+            )
+            self._chat_models.setdefault(key, chat_model)
+        return self._chat_models[key]
+
+    async def aclose(self):
+        """关闭所有连接池（应用退出时调用）"""
+        with self._lock:
+            async_clients = list(self._async_http.values())
+            sync_clients = list(self._http.values())
+            self._async_http.clear()
+            self._http.clear()
+            self._openai.clear()
+            self._async_openai.clear()
+            self._chat_models.clear()
+        for client in async_clients:
+            await client.aclose()
+        for client in sync_clients:
+            client.close()
+
+
+registry = LLMClientRegistry()
+
+
+def get_chat_model(provider: str, model: str = "deepseek-chat", **kwargs) -> ChatOpenAI:
+    return registry.chat_model(provider, model, **kwargs)
@@ -0,0 +1,220 @@
+"""
+大模型调用指标：首字延迟（TTFT）、总耗时、输入/输出 token、流式分块数、错误数，按调用点和模型分组
+以 Prometheus 文本格式在 back.py 的 /metrics 输出
+
+- LangChain 模型：llm_clients 为每个 ChatOpenAI 挂上 metrics_handler，调用时用 site("调用点") 作为 config 传入
+      await llm.ainvoke(prompt, config=llm_metrics.site("profession.classify"))
+- 直接使用 OpenAI SDK：
+      with llm_metrics.track("chat_agent.ask_llm", "glm-4") as call:
+          response = client.chat.completions.create(...)
+          call.usage(response.usage)
+"""
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384)
+CHUNK_BUCKETS = (1, 10, 50, 100, 250, 500, 1000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], label_names=("site", "model")):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        # 标签值 -> [各桶计数..., +Inf 计数, 总和]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            series = self._series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                count = series[len(self.buckets)]
+                for bound, value in zip(self.buckets + ("+Inf",), series):
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {value}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return "\n".join(lines)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names=("site", "model")):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return "\n".join(lines)
+
+
+ttft_seconds = Histogram("llm_ttft_seconds", "Time to first streamed token", LATENCY_BUCKETS)
+latency_seconds = Histogram("llm_latency_seconds", "Total LLM call latency", LATENCY_BUCKETS)
+prompt_tokens = Histogram("llm_prompt_tokens", "Prompt tokens per call", TOKEN_BUCKETS)
+completion_tokens = Histogram("llm_completion_tokens", "Completion tokens per call", TOKEN_BUCKETS)
+stream_chunks = Histogram("llm_stream_chunks", "Streamed chunks per call", CHUNK_BUCKETS)
+requests_total = Counter("llm_requests_total", "LLM calls by outcome", ("site", "model", "status"))
+errors_total = Counter("llm_errors_total", "LLM call errors by exception type", ("site", "model", "error"))
+
+METRICS = [ttft_seconds, latency_seconds, prompt_tokens, completion_tokens, stream_chunks, requests_total, errors_total]
+
+
+def register(metric):
+    """其他模块定义的指标加入 /metrics 输出"""
+    METRICS.append(metric)
+    return metric
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in METRICS) + "\n"
+
+
+def site(name: str) -> dict:
+    """LangChain 调用的 config，标记调用点（子调用会继承 metadata）"""
+    return {"metadata": {"llm_site": name}}
+
+
+class _Call:
+    """一次调用的统计，成功/失败时统一写入指标"""
+
+    def __init__(self, site_name: str, model: str):
+        self.site = site_name or "unknown"
+        self.model = model or "unknown"
+        self.start = time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.chunks = 0
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+
+    def token(self):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.chunks += 1
+
+    def usage(self, usage: Any):
+        """接受 OpenAI SDK 的 usage 对象或 dict（prompt_tokens/completion_tokens 或 input_tokens/output_tokens）"""
+        if usage is None:
+            return
+        get = usage.get if isinstance(usage, dict) else lambda k: getattr(usage, k, None)
+        prompt = get("prompt_tokens") or get("input_tokens")
+        completion = get("completion_tokens") or get("output_tokens")
+        if prompt is not None:
+            self.prompt_tokens = int(prompt)
+        if completion is not None:
+            self.completion_tokens = int(completion)
+
+    def finish(self, error: Optional[BaseException] = None):
+        labels = (self.site, self.model)
+        latency_seconds.observe(time.perf_counter() - self.start, *labels)
+        if self.first_token is not None:
+            ttft_seconds.observe(self.first_token - self.start, *labels)
+            stream_chunks.observe(self.chunks, *labels)
+        if self.prompt_tokens is not None:
+            prompt_tokens.observe(self.prompt_tokens, *labels)
+        if self.completion_tokens is not None:
+            completion_tokens.observe(self.completion_tokens, *labels)
+        # 对冲请求中落败被取消的调用单独计数，不算作错误
+        if isinstance(error, asyncio.CancelledError):
+            requests_total.inc(*labels, "cancelled")
+            return
+        requests_total.inc(*labels, "error" if error else "ok")
+        if error is not None:
+            errors_total.inc(*labels, type(error).__name__)
+
+
+@contextmanager
+def track(site_name: str, model: str):
+    """直接调用 OpenAI SDK 时使用；流式调用时对每个分块调用 call.token()"""
+    call = _Call(site_name, model)
+    try:
+        yield call
+    except BaseException as e:
+        call.finish(e)
+        raise
+    call.finish()
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """挂在 LangChain 模型上的回调，按 run_id 记录每次模型调用"""
+    run_inline = True
+
+    def __init__(self):
+        self._calls: Dict[UUID, _Call] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, metadata: Optional[dict], kwargs: dict):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or ""
+        with self._lock:
+            self._calls[run_id] = _Call((metadata or {}).get("llm_site", ""), model)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata, kwargs)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        # 只统计有内容的分块（首个 role 分块和末尾的 usage 分块为空）
+        call = self._calls.get(run_id)
+        if call is not None and token:
+            call.token()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        call.usage((response.llm_output or {}).get("token_usage"))
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                call.usage(getattr(message, "usage_metadata", None))
+        call.finish()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is not None:
+            call.finish(error)
+
+
+metrics_handler = LLMMetricsHandler()
@@ -0,0 +1,234 @@
+"""
+多服务商路由：按滚动窗口内的延迟和错误率给服务商排序，首选服务商超过其 p95 延迟仍未返回首个分块时，
+向下一个服务商发出对冲（hedged）请求，先返回的一方胜出，另一方立即取消；请求失败时自动切换到下一个服务商
+
+HedgedRouter 提供与 ChatOpenAI 相同的 ainvoke / astream 接口，可直接替换调用点上的模型：
+    router = llm_router.router_from_config("chat")
+    async for chunk in router.astream(messages, config=site("chatback.stream_chat")): ...
+"""
+import asyncio
+import configparser
+import time
+from collections import deque
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+import llm_clients
+from llm_metrics import Counter, register
+
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+# 名称 -> 路由器，供 /api/orange/llm/routes 查看各服务商的滚动统计
+routers = {}
+
+hedges_total = register(Counter("llm_router_requests_total", "Routed LLM calls by provider and outcome",
+                                ("router", "provider", "outcome")))
+
+
+class ProviderStats:
+    """单个服务商的滚动统计：最近 window 次流式调用的首字延迟、非流式调用的总耗时，以及成败"""
+
+    def __init__(self, window: int = 100):
+        self.ttft = deque(maxlen=window)
+        self.latency = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    @staticmethod
+    def quantile(samples, q: float) -> Optional[float]:
+        if len(samples) < 5:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def error_rate(self) -> float:
+        return 1 - sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def record(self, ok: bool, ttft: Optional[float] = None, latency: Optional[float] = None):
+        self.outcomes.append(1 if ok else 0)
+        if ttft is not None:
+            self.ttft.append(ttft)
+        if latency is not None:
+            self.latency.append(latency)
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+
+    def snapshot(self) -> dict:
+        return {
+            "p50_ttft": self.quantile(self.ttft, 0.5),
+            "p95_ttft": self.quantile(self.ttft, 0.95),
+            "p95_latency": self.quantile(self.latency, 0.95),
+            "error_rate": round(self.error_rate(), 4),
+            "samples": len(self.outcomes),
+            "circuit_open": self.open_until > time.monotonic(),
+        }
+
+
+class HedgedRouter:
+    def __init__(self, name: str, routes: List[Tuple[str, Any]], quantile: float = 0.95,
+                 initial_delay: float = 2.0, min_delay: float = 0.3, max_delay: float = 5.0,
+                 window: int = 100, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.name = name
+        self.routes = routes
+        self.quantile = quantile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.stats = {provider: ProviderStats(window) for provider, _ in routes}
+        self.model_name = "router:" + ",".join(provider for provider, _ in routes)
+
+    def ranked(self, streaming: bool = True) -> List[Tuple[str, Any]]:
+        """熔断中的服务商排到最后；其余按 (错误率, 中位首字延迟) 升序，非流式调用按中位总耗时"""
+        now = time.monotonic()
+
+        def score(route):
+            stats = self.stats[route[0]]
+            p50 = stats.quantile(stats.ttft if streaming else stats.latency, 0.5)
+            return stats.open_until > now, round(stats.error_rate(), 1), p50 if p50 is not None else self.initial_delay
+        return sorted(self.routes, key=score)
+
+    def hedge_delay(self, provider: str, streaming: bool) -> float:
+        stats = self.stats[provider]
+        p = stats.quantile(stats.ttft if streaming else stats.latency, self.quantile)
+        return self.initial_delay if p is None else min(max(p, self.min_delay), self.max_delay)
+
+    def _succeeded(self, provider: str, ttft: Optional[float] = None, latency: Optional[float] = None):
+        self.stats[provider].record(True, ttft=ttft, latency=latency)
+        hedges_total.inc(self.name, provider, "won")
+
+    def _failed(self, provider: str):
+        stats = self.stats[provider]
+        stats.record(False)
+        if stats.consecutive_failures >= self.failure_threshold:
+            stats.open_until = time.monotonic() + self.cooldown
+        hedges_total.inc(self.name, provider, "error")
+
+    async def _race(self, start, streaming: bool):
+        """
+        按排名启动服务商：在途请求超过对冲延迟仍无结果时启动下一个（对冲），在途请求全部失败时也启动下一个（切换）
+        start(model) 是返回 (结果, 首字延迟) 的协程，非流式调用没有首字，首字延迟为 None；
+        返回 (胜出的服务商, 结果, 首字延迟)，其余请求全部取消
+        非流式调用在这里记为成功；流式调用胜出时只拿到了首个分块，由 astream 在流结束后记一次成功或失败
+        """
+        queue = self.ranked(streaming)
+        pending = {}
+        current = None
+        last_error: Optional[BaseException] = None
+
+        def launch():
+            nonlocal current
+            current, model = queue.pop(0)
+            pending[asyncio.ensure_future(start(model))] = (current, time.monotonic())
+            if len(pending) > 1:
+                hedges_total.inc(self.name, current, "hedged")
+
+        try:
+            launch()
+            while pending:
+                timeout = self.hedge_delay(current, streaming) if queue else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch()
+                    continue
+                for task in done:
+                    provider, started = pending.pop(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        self._failed(provider)
+                        continue
+                    value, ttft = task.result()
+                    # 两种调用分开统计：流式只记首字延迟，非流式只记总耗时，
+                    # 否则非流式的整段耗时会拉高流式调用的对冲延迟和排名，流式的首字延迟又会拉低非流式的
+                    if not streaming:
+                        self._succeeded(provider, latency=time.monotonic() - started)
+                    return provider, value, ttft
+                if not pending and queue:
+                    launch()
+            raise last_error or RuntimeError("no provider available")
+        finally:
+            for task, (provider, _) in pending.items():
+                task.cancel()
+                task.add_done_callback(_close_stream)
+                hedges_total.inc(self.name, provider, "cancelled")
+
+    async def ainvoke(self, input: Any, config: Optional[dict] = None, **kwargs) -> Any:
+        async def start(model):
+            response = await model.ainvoke(input, config=config, **kwargs)
+            return response, None
+        _, response, _ = await self._race(start, streaming=False)
+        return response
+
+    async def astream(self, input: Any, config: Optional[dict] = None, **kwargs) -> AsyncIterator[Any]:
+        async def start(model):
+            # 只等到首个有内容的分块就参与竞争，之后继续从胜出的流读取
+            begin = time.monotonic()
+            stream = model.astream(input, config=config, **kwargs)
+            buffered = []
+            try:
+                async for chunk in stream:
+                    buffered.append(chunk)
+                    if getattr(chunk, "content", chunk):
+                        return (stream, buffered), time.monotonic() - begin
+            except BaseException:
+                await stream.aclose()
+                raise
+            return (stream, buffered), time.monotonic() - begin
+
+        provider, (stream, buffered), ttft = await self._race(start, streaming=True)
+        failed = False
+        try:
+            for chunk in buffered:
+                yield chunk
+            async for chunk in stream:
+                yield chunk
+        except Exception:
+            # 已经输出了部分内容，不能再切换服务商，记录失败后向上抛出
+            failed = True
+            self._failed(provider)
+            raise
+        finally:
+            await stream.aclose()
+            # 每次调用只记一次：流正常结束或调用方提前停止读取都算服务商成功
+            if not failed:
+                self._succeeded(provider, ttft=ttft)
+
+    def snapshot(self) -> dict:
+        return {provider: stats.snapshot() for provider, stats in self.stats.items()}
+
+
+def _close_stream(task: asyncio.Task):
+    """被取消的对冲任务如果已经拿到流，关闭它以释放连接"""
+    if task.cancelled() or task.exception() is not None:
+        return
+    value, _ = task.result()
+    stream = value[0] if isinstance(value, tuple) else None
+    if hasattr(stream, "aclose"):
+        asyncio.ensure_future(stream.aclose())
+
+
+def router_from_config(name: str, temperature: float = 0.3, streaming: bool = True) -> HedgedRouter:
+    """
+    读取 [router] 中 name 对应的服务商列表（如 chat = deepseek:deepseek-chat, zhipu:glm-4），
+    每个服务商的模型由 llm_clients 创建，连接池共享
+    """
+    spec = config.get('router', name, fallback="deepseek:deepseek-chat")
+    routes = []
+    for item in spec.split(","):
+        provider, _, model = item.strip().partition(":")
+        routes.append((provider, llm_clients.get_chat_model(provider, model or "deepseek-chat",
+                                                            temperature=temperature, streaming=streaming)))
+    router = HedgedRouter(
+        name,
+        routes,
+        quantile=config.getfloat('router', 'hedge_quantile', fallback=0.95),
+        initial_delay=config.getfloat('router', 'initial_delay', fallback=2.0),
+        min_delay=config.getfloat('router', 'min_delay', fallback=0.3),
+        max_delay=config.getfloat('router', 'max_delay', fallback=5.0),
+        window=config.getint('router', 'window', fallback=100),
+        failure_threshold=config.getint('router', 'failure_threshold', fallback=3),
+        cooldown=config.getfloat('router', 'cooldown', fallback=30.0),
+    )
+    routers[name] = router
+    return router
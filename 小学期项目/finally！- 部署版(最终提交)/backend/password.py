@@ -4,6 +4,8 @@ import pymysql
 from dotenv import load_dotenv
 from pydantic import BaseModel
 
+import executor
+
 # 加载环境变量
 load_dotenv()
 
@@ -27,16 +29,19 @@ class user(BaseModel):
     phone_number:str
     password:str
 
+
+def execute(sql, args=None, commit=False):
+    """在共享连接上执行参数化SQL（同步，经 executor 串行调用），参数用 %s 占位，由 pymysql 转义"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, args)
+        rows = cursor.fetchall()
+    if commit:
+        connection.commit()
+    return rows
+
 async def judge(thisuser:user):
-    cursor=connection.cursor()
-    print(1)
-    sql = f"SELECT * FROM alluser where phone_number='{thisuser.phone_number}'"
-    cursor.execute(sql)
-    user_a = cursor.fetchall()
-    connection.commit()
-    print(user_a)
-    print("登录信息正在输入数据库")
-    print("输入是",thisuser)
+    sql = "SELECT * FROM alluser where phone_number=%s"
+    user_a = await executor.run_blocking("user_db", execute, sql, (thisuser.phone_number,))
     if len(user_a) == 0:
         return {"state": 400, "message": "请先注册账号。"}
     elif user_a[0][1]!=thisuser.password:
@@ -46,29 +51,18 @@ async def judge(thisuser:user):
 
 
 async def lookat(thisuser:user):
-    cursor=connection.cursor()
     if thisuser.phone_number=='11000110001' and thisuser.password=='1103' :
         sql="select * from alluser"
-        cursor.execute(sql)
-        user_a = cursor.fetchall()
+        user_a = await executor.run_blocking("user_db", execute, sql, None)
         return {"state": 200, "message":user_a}
     else:
         return{"state":400,"message":"您没有权限。"}
 
 async def reg(thisuser:user):
-    print(12)
-    cursor=connection.cursor()
-    sql = f"SELECT * FROM alluser where phone_number={thisuser.phone_number}"
-    print(sql)
-
-    cursor.execute(sql)
-    user_a = cursor.fetchall()
-    print(user_a)
+    sql = "SELECT * FROM alluser where phone_number=%s"
+    user_a = await executor.run_blocking("user_db", execute, sql, (thisuser.phone_number,))
     if len(user_a) != 0:
         return {"state": 400, "message": "您已经注册账号。"}
-    password='\''+thisuser.password+'\''
-    sql=f"insert into alluser(phone_number,password) values({thisuser.phone_number},{password})"
-    print(sql)
-    cursor.execute(sql)
-    connection.commit()
-    return {"state": 200, "message": "成功注册账号。"}
\ No newline at end of file
+    sql = "insert into alluser(phone_number,password) values(%s,%s)"
+    await executor.run_blocking("user_db", execute, sql, (thisuser.phone_number, thisuser.password), commit=True)
+    return {"state": 200, "message": "成功注册账号。"}
@@ -1,23 +1,48 @@
 from typing import List, Dict, Any, Tuple, Optional
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
-from pydantic import SecretStr
-import os
-from collections import defaultdict
+from collections import defaultdict, deque
+import contextlib
+import numpy as np
 from dotenv import load_dotenv
-import jieba
+import executor
+from kg_binary import CompiledKG, NodeView
+from kg_classifier import LexicalClassifier
+from kg_matcher import MultiPatternMatcher
+from kg_tokenizer import build_tokenizer
+from llm_cache import ResponseCache, prompt_key
+from llm_router import router_from_config
+from llm_metrics import site
+from singleflight import SingleFlight, StreamFanout
 
 # 加载环境变量
 load_dotenv()
 
-# 配置DeepSeek模型
-chat_model_deepseek = ChatOpenAI(
-    model="deepseek-chat",
-    base_url=os.environ["OPENAI_DEEPSEEK_BASE_URL_FREE"],
-    api_key=SecretStr(os.environ["OPENAI_DEEPSEEK_APIKEY_FREE"]),
-    temperature=0.3,
-    streaming=True
-)
+# 配置DeepSeek模型（按 [router] profession 在多个服务商之间对冲和切换，共享连接池）
+chat_model_deepseek = router_from_config("profession", temperature=0.3, streaming=True)
+
+# 合并同一时刻相同 prompt 的LLM调用：分类共享一次结果，解释共享一条流
+llm_flights = SingleFlight()
+explain_fanout = StreamFanout()
+
+# 本地分类器的阈值，在标注查询集 benchmarks/classify_labeled.jsonl 上用 benchmarks/eval_local_classifier.py 标定
+# （要求本地作答准确率不低于95%）：最高分达到 THRESHOLD，且第二名不超过最高分的 (1 - MARGIN) 时直接采用本地结果
+LOCAL_CLASSIFY_THRESHOLD = 0.16
+LOCAL_CLASSIFY_MARGIN = 0.26
+# 与最高分的比值不低于该值的专业类一并返回
+LOCAL_CLASSIFY_RELATIVE = 0.75
+
+
+def select_local_classes(scored: List[Tuple[str, float]], threshold: float = LOCAL_CLASSIFY_THRESHOLD,
+                         margin: float = LOCAL_CLASSIFY_MARGIN,
+                         relative: float = LOCAL_CLASSIFY_RELATIVE) -> List[str]:
+    """由本地分类器的 top-k (专业类, 分数) 决定本地结果；返回空列表表示置信度不够，交给LLM"""
+    if not scored or scored[0][1] < threshold:
+        return []
+    top_score = scored[0][1]
+    # 第一、二名太接近说明查询有歧义（如“医学”同时接近多个医学类），交给LLM判断
+    if len(scored) > 1 and scored[1][1] > top_score * (1 - margin):
+        return []
+    return [cls for cls, score in scored if score >= top_score * relative]
 
 
 # --- 数据模型定义 ---
@@ -42,17 +67,25 @@ class MajorAnalysisResult(BaseModel):
 
 # --- 知识图谱工具 ---
 class KnowledgeGraphTool:
-    def __init__(self, kg_data: List[Tuple[str, str, str, str]]):
-        self.kg_data = kg_data
+    # 遍历接口的上限，防止单个请求展开整个图谱
+    MAX_DEPTH = 6
+    MAX_NODES = 5000
+    MAX_EDGES = 20000
+
+    def __init__(self, kg_data: Optional[List[Tuple[str, str, str, str]]] = None,
+                 graph: Optional[CompiledKG] = None):
+        # 整数化图谱（CSR），索引视图和多跳遍历都在其上进行；只给四元组时在内存中构建
+        self.graph = graph if graph is not None else CompiledKG.from_quads(kg_data or [])
         self._build_indexes()
         self._build_keyword_mappings()
+        self._build_matcher()
+        self._build_class_subgraphs()
+        self.classifier = LexicalClassifier.from_kg(self)
         self._init_jieba()
 
     def _init_jieba(self):
-        """初始化分词词典 确保中文分词不会出现错误"""
-        for entity in self.entity_attrs:
-            jieba.add_word(entity,10)
-            jieba.add_word(entity.split(" ")[0],10)
+        """初始化分词词典 确保中文分词不会出现错误（使用独立分词器，不修改全局 jieba）"""
+        self.tokenizer = build_tokenizer(self.entity_attrs)
 
     def _build_indexes(self):
         """建立实体和关系的索引"""
@@ -76,106 +109,303 @@ class KnowledgeGraphTool:
             "计算机科学与技术": ["专业名称"]
         }
 
-        relations = {
-            "工学": [{"subject": "工学", "relation": "包含", "object": "计算机类"}],
-            "计算机类": [
-                {"subject": "工学", "relation": "包含", "object": "计算机类"},
-                {"subject": "计算机类", "relation": "包含", "object": "计算机科学与技术"}
-            ],
-            "计算机科学与技术": [
-                {"subject": "计算机类", "relation": "包含", "object": "计算机科学与技术"}
-            ]
-        }
-        
         profession_classes = {"计算机类"}
-        """
-        self.entity_attrs = defaultdict(dict)
-        self.entity_types = defaultdict(list)
-        self.relations = defaultdict(list)
-        self.profession_classes = set()
 
-        for item in self.kg_data:
-            if len(item) < 4:
-                continue
+        邻接索引，查询上下级时只与该节点的度数相关：
+        items_by_subject = {"计算机类": [("实体", "计算机类", "专业类", "包含计算机相关专业"), ...]}
+        parents = {"计算机类": ["工学"]}
+        children = {"计算机类": ["计算机科学与技术"]}
 
-            item_type, subject, predicate, obj = item
-
-            if item_type == "实体":
-                self.entity_attrs[subject][predicate] = obj
-                self.entity_types[subject].append(predicate)
-                if predicate == "专业类" and subject.endswith("类"):
-                    self.profession_classes.add(subject)
-            elif item_type == "实体关系":
-                relation = {
-                    "subject": subject,
-                    "relation": predicate,
-                    "object": obj
-                }
-                self.relations[subject].append(relation)
-                self.relations[obj].append(relation)
+        除 profession_classes 外都是 NodeView：键和值在查询时由图谱的 CSR 数组和字符串表现算，
+        图谱从 mmap 打开时各 worker 共享同一份数据，进程内不展开四元组
+        """
+        graph = self.graph
+        quads = graph.quads
+        entity, relation, self._contains, class_predicate = (
+            -1 if i is None else i for i in map(graph.id_of, ("实体", "实体关系", "包含", "专业类")))
+        self._entity = entity
+        is_entity = quads[:, 0] == entity
+        is_contains = (quads[:, 0] == relation) & (quads[:, 2] == self._contains)
+
+        entity_ids = np.unique(quads[is_entity, 1])
+        self.entity_attrs = NodeView(graph, entity_ids, lambda i: {
+            graph.string(p): graph.string(o) for _, _, p, o in self._entity_rows(i)})
+        self.entity_types = NodeView(graph, entity_ids, lambda i: [
+            graph.string(p) for _, _, p, _ in self._entity_rows(i)])
+        self.items_by_subject = NodeView(graph, np.unique(quads[:, 1]), self._items_of)
+        self.parents = NodeView(graph, np.unique(quads[is_contains, 3]), lambda i: [
+            graph.string(n) for n in self._linked(graph.in_edges, i)])
+        self.children = NodeView(graph, np.unique(quads[is_contains, 1]), lambda i: [
+            graph.string(n) for n in self._linked(graph.out_edges, i)])
+        class_ids = np.unique(quads[is_entity & (quads[:, 2] == class_predicate), 1]).tolist()
+        self.profession_classes = frozenset(name for name in map(graph.string, class_ids) if name.endswith("类"))
+
+    def _entity_rows(self, i: int) -> List[List[int]]:
+        rows = self.graph.quads_of(i)
+        return rows[rows[:, 0] == self._entity].tolist()
+
+    def _items_of(self, i: int) -> List[Tuple[str, ...]]:
+        """主体为节点 i 的四元组（解码成字符串）"""
+        return [self.graph.decode(row) for row in self.graph.quads_of(i).tolist()]
+
+    def _linked(self, edges, i: int) -> List[int]:
+        """节点 i 经"包含"关系相连的节点下标；edges 为 graph.out_edges（下级）或 graph.in_edges（上级）"""
+        nodes, predicates = edges(i)
+        return nodes[predicates == self._contains].tolist()
 
     def _build_keyword_mappings(self):
-        """构建关键词映射表"""
-        self.keyword_map = {
-            # 从知识图谱中提取所有专业和门类
-            **{entity: entity for entity in self.entity_attrs},
-            # 添加反向映射
-            **{v.split()[0]: v for v in self.entity_attrs if " " in v}
-        }
+        """构建关键词映射表：实体名映射到自身，只需记录带空格实体的简称（空格前的部分）-> 全称"""
+        self.keyword_aliases = {v.split()[0]: v for v in self.entity_attrs if " " in v}
+
+    def _build_matcher(self):
+        """
+        在专业类、专业名称、学位授予门类上建立多模式匹配器，查询文本只需扫描一遍
+        专业类同时登记去掉"类"字的词干（计算机类 -> 计算机），兼容原来的模糊匹配规则
+        """
+        self.matcher = MultiPatternMatcher()
+        for entity, types in self.entity_types.items():
+            if entity in self.profession_classes:
+                self.matcher.add(entity, ("class", entity))
+                stem = entity.split('类')[0]
+                if stem and stem != entity:
+                    self.matcher.add(stem, ("class", entity))
+            if "专业名称" in types:
+                self.matcher.add(entity, ("major", entity))
+            if "学位授予门类" in types:
+                self.matcher.add(entity, ("degree", entity))
+        self.matcher.build()
+
+        # 专业类名称的所有子串 -> 专业类，用于 "关键词是专业类名称一部分" 的匹配
+        self.class_substrings = defaultdict(list)
+        # 专业类名称的所有前缀 -> 专业类，用于校验LLM返回的类别名
+        self.class_prefixes = {}
+        for cls in sorted(self.profession_classes):
+            for start in range(len(cls)):
+                for end in range(start + 1, len(cls) + 1):
+                    if cls not in self.class_substrings[cls[start:end]]:
+                        self.class_substrings[cls[start:end]].append(cls)
+            for end in range(1, len(cls) + 1):
+                self.class_prefixes.setdefault(cls[:end], cls)
+        self.class_substrings = dict(self.class_substrings)
+
+    def match_text(self, text: str) -> Dict[str, List[str]]:
+        """单次扫描文本，返回命中的专业类、专业名称和学位授予门类（按出现顺序去重）"""
+        groups = {"class": "classes", "major": "majors", "degree": "degrees"}
+        matched = {group: {} for group in groups.values()}
+        for _, _, _, (kind, entity) in self.matcher.iter_matches(text):
+            matched[groups[kind]][entity] = None
+        return {group: list(entities) for group, entities in matched.items()}
+
+    def classify_by_keywords(self, text: str, limit: int = 10) -> List[str]:
+        """
+        关键词分类：文本中直接提到的专业类优先，其次是提到的专业所属的专业类，
+        都没有时再用学位授予门类下的专业类
+        """
+        matched = self.match_text(text.replace(" ", ""))
+        classes = dict.fromkeys(matched["classes"])
+        for major in matched["majors"]:
+            for parent in self.parents.get(major, []):
+                if parent in self.profession_classes:
+                    classes[parent] = None
+        if not classes:
+            for degree in matched["degrees"]:
+                for child in self.children.get(degree, []):
+                    if child in self.profession_classes:
+                        classes[child] = None
+        return list(classes)[:limit]
+
+    def resolve_class(self, name: str) -> Optional[str]:
+        """把LLM返回的类别名对应到图谱中的专业类：先精确匹配，再按去掉"类"字后的前缀匹配"""
+        if name in self.profession_classes:
+            return name
+        return self.class_prefixes.get(name[:-1])
 
     def get_related_classes(self, keywords: List[str]) -> List[str]:
         """根据关键词获取相关专业类"""
-        related_classes = set()
+        related_classes = {}
 
         for kw in keywords:
             # 精确匹配
             if kw in self.profession_classes:
-                related_classes.add(kw)
+                related_classes[kw] = None
                 continue
 
-            # 模糊匹配
-            for cls in self.profession_classes:
-                if kw in cls or cls.split('类')[0] in kw:
-                    related_classes.add(cls)
+            # 模糊匹配：关键词是专业类名称的一部分，或关键词中包含专业类词干
+            for cls in self.class_substrings.get(kw, []):
+                related_classes[cls] = None
+            for _, _, _, (kind, cls) in self.matcher.iter_matches(kw):
+                if kind == "class":
+                    related_classes[cls] = None
 
         return list(related_classes)[:10]  # 最多返回10个
 
     def get_class_hierarchy(self, class_name: str) -> List[Tuple[str, str, str, str]]:
-        """获取专业类的上下级关系"""
+        """获取专业类的上下级关系（基于邻接索引，耗时与该专业类的度数成正比）"""
         results = []
+        node = self.graph.id_of(class_name)
+        if node is None:
+            return results
+        name = self.graph.string
 
         # 1. 添加专业类本身
-        for item in self.kg_data:
-            if len(item) >= 4 and item[1] == class_name:
-                results.append(item)
+        results.extend(self._items_of(node))
 
         # 2. 添加上级关系(学位授予门类)
-        for rels in self.relations.values():
-            for rel in rels:
-                if rel["relation"] == "包含" and rel["object"] == class_name:
-                    # 找到包含这个专业类的上级
-                    for item in self.kg_data:
-                        if len(item) >= 4 and item[1] == rel["subject"]:
-                            results.append(item)
-                    # 添加上级关系
-                    results.append(("实体关系", rel["subject"], "包含", class_name))
+        for parent in self._linked(self.graph.in_edges, node):
+            results.extend(self._items_of(parent))
+            results.append(("实体关系", name(parent), "包含", class_name))
 
         # 3. 添加下级关系(专业名称)
-        for rel in self.relations.get(class_name, []):
-            if rel["relation"] == "包含" and rel["subject"] == class_name:
-                obj = rel["object"]
-                # 找到这个专业类包含的专业
-                for item in self.kg_data:
-                    if len(item) >= 4 and item[1] == obj:
-                        results.append(item)
-                # 添加包含关系
-                results.append(("实体关系", class_name, "包含", obj))
+        for child in self._linked(self.graph.out_edges, node):
+            results.extend(self._items_of(child))
+            results.append(("实体关系", class_name, "包含", name(child)))
 
         return results
 
+    def _build_class_subgraphs(self):
+        """
+        每个专业类的子图（去重后的四元组、节点、边）在第一次用到时计算并缓存，专业类只有几十个，之后查询时直接合并
+        class_subgraphs = {
+            "计算机类": {
+                "quads": (("实体", "计算机类", "专业类", ...), ("实体关系", "工学", "包含", "计算机类"), ...),
+                "nodes": ("计算机类", "工学", "计算机科学与技术", ...),
+                "edges": (("工学", "包含", "计算机类"), ("计算机类", "包含", "计算机科学与技术"), ...)
+            }
+        }
+        """
+        self.class_subgraphs = {}
+
+    def class_subgraph(self, cls: str) -> Optional[Dict[str, tuple]]:
+        """专业类的子图，不是专业类时返回 None"""
+        subgraph = self.class_subgraphs.get(cls)
+        if subgraph is None and cls in self.profession_classes:
+            quads = tuple(dict.fromkeys(tuple(item) for item in self.get_class_hierarchy(cls)))
+            edges = tuple(dict.fromkeys(item[1:4] for item in quads if item[0] == "实体关系"))
+            nodes = tuple(dict.fromkeys(node for edge in edges for node in (edge[0], edge[2])))
+            # 并发请求可能重复计算，结果相同，以先写入的为准
+            subgraph = self.class_subgraphs.setdefault(cls, {"quads": quads, "nodes": nodes, "edges": edges})
+        return subgraph
+
+    def get_subgraph(self, classes: List[str]) -> Dict[str, list]:
+        """合并多个专业类的子图，结果去重并保持顺序"""
+        quads, nodes, edges = {}, {}, {}
+        for cls in classes:
+            subgraph = self.class_subgraph(cls)
+            if subgraph is None:
+                continue
+            quads.update(dict.fromkeys(subgraph["quads"]))
+            nodes.update(dict.fromkeys(subgraph["nodes"]))
+            edges.update(dict.fromkeys(subgraph["edges"]))
+        return {"kg_data": list(quads), "nodes": list(nodes), "edges": list(edges)}
+
+    def _neighbors(self, node: int, direction: str):
+        """按方向产出 (邻居下标, 边(主体, 谓词, 客体)下标)"""
+        if direction in ("descendants", "both"):
+            targets, relations = self.graph.out_edges(node)
+            for target, rel in zip(targets.tolist(), relations.tolist()):
+                yield target, (node, rel, target)
+        if direction in ("ancestors", "both"):
+            sources, relations = self.graph.in_edges(node)
+            for source, rel in zip(sources.tolist(), relations.tolist()):
+                yield source, (source, rel, node)
+
+    def traverse(self, entity: str, direction: str = "descendants", depth: int = 2,
+                 max_nodes: int = 200, max_edges: int = 500) -> Dict[str, Any]:
+        """
+        从 entity 出发做有界广度优先遍历
+        direction: descendants（下级）/ ancestors（上级）/ both
+        返回 {"root", "nodes": [名称...], "edges": [(主体, 谓词, 客体)...], "truncated": 是否因预算截断}
+        """
+        if direction not in ("descendants", "ancestors", "both"):
+            raise ValueError(f"不支持的遍历方向: {direction}")
+        depth = max(0, min(depth, self.MAX_DEPTH))
+        max_nodes = max(1, min(max_nodes, self.MAX_NODES))
+        max_edges = max(0, min(max_edges, self.MAX_EDGES))
+        root = self.graph.id_of(entity)
+        if root is None:
+            return {"root": entity, "nodes": [], "edges": [], "truncated": False}
+
+        seen = {root: 0}
+        edges = {}
+        truncated = False
+        queue = deque([root])
+        while queue and not truncated:
+            node = queue.popleft()
+            if seen[node] >= depth:
+                continue
+            for neighbor, edge in self._neighbors(node, direction):
+                if edge not in edges:
+                    if len(edges) >= max_edges:
+                        truncated = True
+                        break
+                    if neighbor not in seen and len(seen) >= max_nodes:
+                        truncated = True
+                        break
+                    edges[edge] = None
+                if neighbor not in seen:
+                    seen[neighbor] = seen[node] + 1
+                    queue.append(neighbor)
+
+        name = self.graph.string
+        return {
+            "root": entity,
+            "nodes": [name(n) for n in seen],
+            "edges": [(name(a), name(r), name(b)) for a, r, b in edges],
+            "truncated": truncated,
+        }
+
+    def batch_traverse(self, entities: List[str], **kwargs) -> Dict[str, Dict[str, Any]]:
+        """对多个实体分别遍历，预算按实体单独计算"""
+        return {entity: self.traverse(entity, **kwargs) for entity in dict.fromkeys(entities)}
+
+    def find_paths(self, source: str, target: str, max_depth: int = 4,
+                   max_paths: int = 10) -> List[List[Tuple[str, str, str]]]:
+        """
+        查找两个实体之间的最短路径（忽略边方向，如 专业 -> 专业类 -> 专业），
+        每条路径是按顺序排列的边 (主体, 谓词, 客体) 列表，边保持图谱中的原始方向
+        """
+        max_depth = max(0, min(max_depth, self.MAX_DEPTH))
+        start, goal = self.graph.id_of(source), self.graph.id_of(target)
+        if start is None or goal is None:
+            return []
+        if start == goal:
+            return [[]]
+
+        # 分层BFS，记录每个节点在最短路径上的所有前驱
+        preds = {start: []}
+        frontier = [start]
+        for _ in range(max_depth):
+            next_frontier = {}
+            for node in frontier:
+                for neighbor, edge in self._neighbors(node, "both"):
+                    if neighbor in preds:
+                        continue
+                    next_frontier.setdefault(neighbor, []).append((node, edge))
+            if not next_frontier:
+                break
+            preds.update(next_frontier)
+            if goal in next_frontier:
+                break
+            frontier = list(next_frontier)
+        if goal not in preds:
+            return []
+
+        # 从终点回溯，最多展开 max_paths 条
+        name = self.graph.string
+        paths = []
+        stack = [(goal, [])]
+        while stack and len(paths) < max_paths:
+            node, suffix = stack.pop()
+            if node == start:
+                paths.append([(name(a), name(r), name(b)) for a, r, b in suffix])
+                continue
+            for prev, edge in preds[node]:
+                stack.append((prev, [edge] + suffix))
+        return paths
+
     def normalize_keywords(self, text: str) -> UserInput:
         """执行关键词标准化"""
-        words = [w for w in jieba.lcut(text) if w.strip()]
+        words = [w for w in self.tokenizer.lcut(text) if w.strip()]
 
         mapping_record = {}
         matched_keywords = {"majors": [], "categories": []}
@@ -183,8 +413,7 @@ class KnowledgeGraphTool:
 
         for word in words:
             original = word
-            if word in self.keyword_map:
-                word = self.keyword_map[word]
+            word = self.keyword_aliases.get(word, word)
 
             if original != word:
                 mapping_record[original] = word
@@ -207,9 +436,23 @@ class KnowledgeGraphTool:
 
 # --- 专业分析Agent ---
 class MajorAnalysisAgent:
-    def __init__(self, kg_tool: KnowledgeGraphTool, llm=chat_model_deepseek):
+    def __init__(self, kg_tool: KnowledgeGraphTool, llm=chat_model_deepseek,
+                 local_threshold: float = LOCAL_CLASSIFY_THRESHOLD,
+                 response_cache: Optional[ResponseCache] = None,
+                 local_margin: float = LOCAL_CLASSIFY_MARGIN,
+                 local_relative: float = LOCAL_CLASSIFY_RELATIVE):
         self.kg_tool = kg_tool
         self.llm = llm
+        self.local_threshold = local_threshold
+        self.local_margin = local_margin
+        self.local_relative = local_relative
+        # 传入时缓存流式解释，相同 prompt 直接回放已保存的分块
+        self.response_cache = response_cache
+
+    def classify_locally(self, user_input: str, k: int = 5) -> List[str]:
+        """本地 TF-IDF 分类，最高分低于阈值或与第二名差距太小时返回空列表（交给LLM）"""
+        scored = self.kg_tool.classifier.classify([user_input], k=k)[0]
+        return select_local_classes(scored, self.local_threshold, self.local_margin, self.local_relative)
 
     async def analyze_with_llm(self, user_input: str) -> List[str]:
         """使用LLM识别相关专业类"""
@@ -236,7 +479,8 @@ class MajorAnalysisAgent:
             用户输入：{user_input}
             相关专业类别："""
 
-        response = await self.llm.ainvoke(prompt)
+        key = prompt_key(getattr(self.llm, "model_name", ""), prompt)
+        response = await llm_flights.do(key, lambda: self.llm.ainvoke(prompt, config=site("profession.classify")))
 
         # 处理响应结果
         output = response.content.strip() if hasattr(response, 'content') else str(response)
@@ -244,30 +488,28 @@ class MajorAnalysisAgent:
 
     async def analyze(self, user_input: UserInput) -> MajorAnalysisResult:
         """执行分析"""
-        # 1. 使用LLM识别相关专业类
-        llm_classes = await self.analyze_with_llm(user_input.raw_query)
+        # 1. 本地分类器置信度足够时直接使用，否则使用LLM识别相关专业类
+        llm_classes = self.classify_locally(user_input.raw_query)
+        if not llm_classes:
+            llm_classes = await self.analyze_with_llm(user_input.raw_query)
 
         # 2. 验证专业类是否存在
         valid_classes = []
         for cls in llm_classes:
-            if cls in self.kg_tool.profession_classes:
-                valid_classes.append(cls)
-            else:
-                # 尝试模糊匹配
-                for real_cls in self.kg_tool.profession_classes:
-                    if real_cls.startswith(cls[:-1]):  # 忽略结尾的"类"字
-                        valid_classes.append(real_cls)
-                        break
+            # 精确匹配，失败时按前缀模糊匹配（忽略结尾的"类"字）
+            real_cls = self.kg_tool.resolve_class(cls)
+            if real_cls:
+                valid_classes.append(real_cls)
 
         # 3. 如果没有有效结果，使用关键词匹配
         if not valid_classes:
-            keywords = [w for w in jieba.lcut(user_input.raw_query) if len(w) > 1]
+            valid_classes = self.kg_tool.classify_by_keywords(user_input.raw_query)
+        if not valid_classes:
+            keywords = [w for w in self.kg_tool.tokenizer.lcut(user_input.raw_query) if len(w) > 1]
             valid_classes = self.kg_tool.get_related_classes(keywords)
 
-        # 4. 获取所有相关四元组
-        results = []
-        for cls in valid_classes[:10]:  # 最多10个
-            results.extend(self.kg_tool.get_class_hierarchy(cls))
+        # 4. 获取所有相关四元组（合并预计算的专业类子图）
+        results = self.kg_tool.get_subgraph(valid_classes[:10])["kg_data"]  # 最多10个
 
         return MajorAnalysisResult(
             matched_majors=[],
@@ -290,10 +532,17 @@ class MajorAnalysisAgent:
             请用详细的中文说明，评价该用户的专业兴趣倾向，并详细列出这些类别下常见的专业名称，并简要介绍每个类别的特点。
             """
 
-            # 添加超时和异常处理
-            async for chunk in self.llm.astream(prompt):
-                if hasattr(chunk, 'content') and chunk.content:
-                    yield chunk.content
+            key = prompt_key(getattr(self.llm, "model_name", ""), prompt)
+            if self.response_cache is not None:
+                cached = await executor.run_blocking("response_cache", self.response_cache.get, key)
+                if cached is not None:
+                    for chunk in cached:
+                        yield chunk
+                    return
+
+            # 相同 prompt 正在生成时直接订阅那条流，不再重复调用LLM
+            async for chunk in explain_fanout.stream(key, lambda: self._generate_explanation(prompt, key)):
+                yield chunk
 
         except Exception as e:
             # 如果流式调用失败，返回静态分析结果
@@ -307,12 +556,25 @@ class MajorAnalysisAgent:
             """
             yield fallback_text
 
+    async def _generate_explanation(self, prompt: str, key: str):
+        """调用LLM流式生成解释；完整生成后写入响应缓存，出错或被取消（没有订阅者了）时不写入"""
+        chunks = []
+        async with contextlib.aclosing(self.llm.astream(prompt, config=site("profession.explain"))) as stream:
+            async for chunk in stream:
+                if hasattr(chunk, 'content') and chunk.content:
+                    chunks.append(chunk.content)
+                    yield chunk.content
+        if self.response_cache is not None and chunks:
+            await executor.run_blocking("response_cache", self.response_cache.set, key, chunks)
+
 
 # --- 主流程 ---
-async def analyze_major_query(kg_data: List[Tuple[str, str, str, str]], query: str):
-    """分析专业查询的主流程"""
+async def analyze_major_query(kg_data: List[Tuple[str, str, str, str]], query: str,
+                              kg_tool: Optional[KnowledgeGraphTool] = None):
+    """分析专业查询的主流程，传入已建好的 kg_tool 时不再重新构建"""
     # 初始化知识图谱工具
-    kg_tool = KnowledgeGraphTool(kg_data)
+    if kg_tool is None:
+        kg_tool = KnowledgeGraphTool(kg_data)
     # 标准化输入
     normalized_input = kg_tool.normalize_keywords(query)
     # 创建分析Agent
@@ -321,8 +583,8 @@ async def analyze_major_query(kg_data: List[Tuple[str, str, str, str]], query: s
     result = await analysis_agent.analyze(normalized_input)
     return result
 
-async def analyze_user_query(kg_data, query):
-    result = await analyze_major_query(kg_data, query)
+async def analyze_user_query(kg_data, query, kg_tool=None):
+    result = await analyze_major_query(kg_data, query, kg_tool)
     return result.related_entities
 
 
@@ -0,0 +1,149 @@
+"""
+把院校推荐用的“基础数据”物化成一张带类型和索引的表 tianjin_recommend_base：
+院校名称、专业名称、所在地、科目要求及其选科掩码、招生人数（整数）、平均分、最好的学科评估等级及得分、数字排名
+
+原来每次推荐都要在 text 列上去逗号、转数字、按校求平均分并关联学科评估和排名；物化后推荐查询只扫描这一张表的索引。
+刷新时在新表中建好数据再原子改名替换，并在 tianjin_recommend_base_meta 记录版本号和四张源表的校验和，
+源表更新后版本不再匹配，后端自动改用实时查询，直到重新刷新
+
+用法（在 backend 目录下运行，可放入 cron 定时执行；源表未变化时 refresh 直接跳过）：
+    python recommend_base.py refresh [--force]
+    python recommend_base.py status
+刷新后调用 POST /api/orange/recommend/reload，正在运行的后端即改用新表
+"""
+import argparse
+import hashlib
+import json
+import time
+
+import recommend_engine
+from recommend_engine import (BASE_META_TABLE, BASE_SCHEMA_VERSION, BASE_TABLE, GRADE_SCORES, OTHER_GRADE_SCORE,
+                              SOURCE_CTES, requirement_mask, source_checksum)
+
+BUILD_TABLE = BASE_TABLE + "_build"
+OLD_TABLE = BASE_TABLE + "_old"
+
+CREATE_SQL = """CREATE TABLE {table} (
+  `id` int unsigned NOT NULL AUTO_INCREMENT,
+  `院校名称` varchar(50) NOT NULL,
+  `专业名称` varchar(255) NOT NULL,
+  `所在地` varchar(20) NOT NULL,
+  `科目要求` varchar(50) NOT NULL,
+  `科目掩码` tinyint unsigned NOT NULL DEFAULT 0,
+  `任选掩码` tinyint unsigned NOT NULL DEFAULT 0,
+  `招生人数` int unsigned NOT NULL,
+  `平均分` double NOT NULL,
+  `评估等级` varchar(4) DEFAULT NULL,
+  `学科评估` decimal(3,2) NOT NULL,
+  `学校排名` int unsigned DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_平均分_掩码` (`平均分`, `科目掩码`, `任选掩码`),
+  KEY `idx_院校名称` (`院校名称`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci"""
+
+_GRADE_NAME = " ".join(f"WHEN {value} THEN '{grade}'" for grade, value in GRADE_SCORES.items())
+
+SELECT_SQL = f"""WITH {SOURCE_CTES.format(assessment_filter="")}
+SELECT DISTINCT e.院校名称, e.专业名称, e.所在地, TRIM(e.科目要求),
+       CAST(REPLACE(e.计划数, ',', '') AS UNSIGNED),
+       a.平均分,
+       CASE s.学科评估 {_GRADE_NAME} END,
+       COALESCE(s.学科评估, {OTHER_GRADE_SCORE}),
+       r.学校排名
+FROM tianjin_enrollment_plan e
+JOIN 录取 a ON e.院校名称 = a.院校名称
+LEFT JOIN 评估 s ON e.院校名称 = s.校名
+LEFT JOIN 排名 r ON e.院校名称 = r.院校
+WHERE CAST(REPLACE(e.计划数, ',', '') AS UNSIGNED) > 0"""
+
+INSERT_SQL = ("INSERT INTO {table} (院校名称, 专业名称, 所在地, 科目要求, 招生人数, 平均分, 评估等级, 学科评估, 学校排名)\n"
+              + SELECT_SQL)
+
+CREATE_META_SQL = f"""CREATE TABLE IF NOT EXISTS {BASE_META_TABLE} (
+  `id` tinyint unsigned NOT NULL,
+  `version` char(12) NOT NULL,
+  `schema_version` int NOT NULL,
+  `source_checksum` char(40) NOT NULL,
+  `row_count` int unsigned NOT NULL,
+  `refreshed_at` datetime NOT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci"""
+
+# “科目要求”只有十几种取值，逐个解析成掩码后回填（解析规则与内存索引共用 recommend_engine.requirement_mask）
+MASK_SQL = "UPDATE {table} SET 科目掩码 = %s, 任选掩码 = %s WHERE 科目要求 = %s"
+
+SAVE_META_SQL = f"REPLACE INTO {BASE_META_TABLE} VALUES (1, %s, %s, %s, %s, NOW())"
+STATUS_SQL = f"SELECT version, schema_version, source_checksum, row_count, refreshed_at FROM {BASE_META_TABLE} WHERE id = 1"
+
+
+def make_version(checksum: str) -> str:
+    """版本号：源表校验和 + 列结构版本的摘要"""
+    return hashlib.sha1(f"{BASE_SCHEMA_VERSION}:{checksum}".encode("utf-8")).hexdigest()[:12]
+
+
+def status() -> dict:
+    checksum = source_checksum()
+    try:
+        meta = recommend_engine.query(STATUS_SQL)
+    except Exception:
+        meta = ()
+    if not meta:
+        return {"table": BASE_TABLE, "version": None, "fresh": False, "expected_version": make_version(checksum)}
+    version, schema_version, stored_checksum, row_count, refreshed_at = meta[0]
+    return {
+        "table": BASE_TABLE,
+        "version": version,
+        "schema_version": int(schema_version),
+        "rows": int(row_count),
+        "refreshed_at": str(refreshed_at),
+        "fresh": int(schema_version) == BASE_SCHEMA_VERSION and stored_checksum == checksum,
+        "expected_version": make_version(checksum),
+    }
+
+
+def refresh(force: bool = False) -> dict:
+    """重建物化表；源表和列结构都没变化时跳过（force=True 强制重建）"""
+    current = status()
+    if current["fresh"] and not force:
+        return dict(current, refreshed=False)
+
+    start = time.perf_counter()
+    checksum = source_checksum()
+    connection = recommend_engine.connect()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {BUILD_TABLE}, {OLD_TABLE}")
+            cursor.execute(CREATE_SQL.format(table=BUILD_TABLE))
+            rows = cursor.execute(INSERT_SQL.format(table=BUILD_TABLE))
+            cursor.execute(f"SELECT DISTINCT 科目要求 FROM {BUILD_TABLE}")
+            for (requirement,) in cursor.fetchall():
+                cursor.execute(MASK_SQL.format(table=BUILD_TABLE), requirement_mask(requirement) + (requirement,))
+            cursor.execute(f"ANALYZE TABLE {BUILD_TABLE}")
+            cursor.fetchall()
+            if cursor.execute("SHOW TABLES LIKE %s", (BASE_TABLE,)):
+                cursor.execute(f"RENAME TABLE {BASE_TABLE} TO {OLD_TABLE}, {BUILD_TABLE} TO {BASE_TABLE}")
+                cursor.execute(f"DROP TABLE {OLD_TABLE}")
+            else:
+                cursor.execute(f"RENAME TABLE {BUILD_TABLE} TO {BASE_TABLE}")
+            cursor.execute(CREATE_META_SQL)
+            cursor.execute(SAVE_META_SQL, (make_version(checksum), BASE_SCHEMA_VERSION, checksum, rows))
+        connection.commit()
+    finally:
+        connection.close()
+    return dict(status(), refreshed=True, seconds=round(time.perf_counter() - start, 3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="院校推荐基础数据物化表")
+    sub = parser.add_subparsers(dest="command", required=True)
+    refresh_parser = sub.add_parser("refresh", help="重建物化表（源表未变化时跳过）")
+    refresh_parser.add_argument("--force", action="store_true", help="源表未变化也强制重建")
+    sub.add_parser("status", help="查看物化表版本及是否过期")
+    args = parser.parse_args()
+
+    result = refresh(force=args.force) if args.command == "refresh" else status()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
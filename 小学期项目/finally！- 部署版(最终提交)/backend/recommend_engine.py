@@ -0,0 +1,391 @@
+"""
+确定性院校推荐：三种填报策略（科目优先 / 院校优先 / 城市优先）直接用预置的参数化 SQL 计算，
+不再让大模型编写 SQL；大模型只在开启 [recommend] narrative 时为结果写一段说明
+
+加权得分（与原 smart_recommend 提示词中的公式一致）：
+    分数匹配度 1 - |平均分 - 考生分数| / 50
+    学科评估   A+=1.0, A=0.9, A-=0.8, B+=0.7, B=0.6, B-=0.5, 其他=0.3
+    学校排名   1 - 排名 / 500（无排名或排名超过 500 记 0）
+    招生规模   LN(招生人数 + 1) / LN(100)
+    城市       所在地为目标城市记 1，否则 0（仅城市优先）
+加权和低于 0.3 的、平均分比考生分数高 20 分及以上的专业不纳入推荐
+选科按位掩码精确筛选：“科目要求”解析成 (必选掩码, 任选掩码)，考生选科也是掩码，可报条件为
+(必选 & ~考生) == 0 且（任选为 0 或 任选 & 考生 != 0）
+
+“基础数据”（录取平均分、最好的学科评估、数字排名）可由 recommend_base.py 物化成带类型和索引的表，
+物化表存在且未过期时查询只扫描这一张表
+"""
+import configparser
+import hashlib
+import json
+import math
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pymysql
+
+import executor
+
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+# 开启后由大模型为推荐结果写一段说明（推荐本身不调用大模型）
+narrative_enabled = config.getboolean('recommend', 'narrative', fallback=False)
+# 物化表可用且未过期时从物化表查询
+use_materialized = config.getboolean('recommend', 'materialized', fallback=True)
+
+GRADE_SCORES = {"A+": 1.0, "A": 0.9, "A-": 0.8, "B+": 0.7, "B": 0.6, "B-": 0.5}
+OTHER_GRADE_SCORE = 0.3
+
+# 策略 -> (分数匹配度, 学科评估, 学校排名, 招生规模, 城市) 的权重
+STRATEGY_WEIGHTS = {
+    "科目优先": (0.2, 0.6, 0.1, 0.1, 0.0),
+    "院校优先": (0.2, 0.1, 0.6, 0.1, 0.0),
+    "城市优先": (0.2, 0.1, 0.1, 0.1, 0.5),
+}
+MIN_WEIGHTED_SCORE = 0.3
+SCORE_CEILING = 20
+TOP_PER_TIER = 5
+
+# 前端的选科名称 -> 招生计划“科目要求”中的写法
+SUBJECT_ALIASES = {"政治": "思想政治"}
+
+# 选考科目 -> 位；“科目要求”解析成 (必选掩码, 任选掩码)：“加”连接的科目都要选考，“或”连接的选考其一即可
+SUBJECT_BITS = {"物理": 1, "化学": 2, "生物": 4, "历史": 8, "地理": 16, "思想政治": 32}
+# 无法识别的科目占用的位，考生掩码中永远没有这一位，因此要求它的专业不会被推荐
+UNKNOWN_SUBJECT_BIT = 64
+
+_GRADE_CASE = " ".join(f"WHEN '{grade}' THEN {value}" for grade, value in GRADE_SCORES.items())
+
+# 录取平均分、最好的学科评估、数字排名：实时查询和物化表刷新共用
+SOURCE_CTES = f"""录取 AS (
+    SELECT 院校名称, AVG(总成绩) AS 平均分
+    FROM tianjin_college_admission
+    GROUP BY 院校名称
+), 评估 AS (
+    SELECT 校名, MAX(CASE 评选结果 {_GRADE_CASE} ELSE {OTHER_GRADE_SCORE} END) AS 学科评估
+    FROM subject_assessment{{assessment_filter}}
+    GROUP BY 校名
+), 排名 AS (
+    SELECT 院校, MIN(CAST(排名 AS UNSIGNED)) AS 学校排名
+    FROM common_ranking
+    WHERE 排名 REGEXP '^[0-9]+$'
+    GROUP BY 院校
+)"""
+
+_WEIGHTED_SCORE = """%(w_score)s * (1 - ABS({p}平均分 - %(score)s) / 50)
+         + %(w_assessment)s * {assessment}
+         + %(w_rank)s * GREATEST(1 - COALESCE({p}学校排名, 500) / 500, 0)
+         + %(w_scale)s * LN({p}招生人数 + 1) / LN(100)
+         + %(w_city)s * ({p}所在地 = %(city)s)"""
+
+_MAJOR_FILTER = """
+    WHERE 学科 LIKE %(assessment_like)s"""
+
+RECOMMEND_SQL = f"""
+WITH {SOURCE_CTES.format(assessment_filter=_MAJOR_FILTER)}, 基础数据 AS (
+    SELECT e.院校名称, e.专业名称, e.所在地,
+           CAST(REPLACE(e.计划数, ',', '') AS UNSIGNED) AS 招生人数,
+           a.平均分,
+           COALESCE(s.学科评估, {OTHER_GRADE_SCORE}) AS 学科评估,
+           r.学校排名
+    FROM tianjin_enrollment_plan e
+    JOIN 录取 a ON e.院校名称 = a.院校名称
+    LEFT JOIN 评估 s ON e.院校名称 = s.校名
+    LEFT JOIN 排名 r ON e.院校名称 = r.院校
+    WHERE e.科目要求 IN %(requirements)s
+      AND e.专业名称 LIKE %(major_like)s
+    GROUP BY e.院校名称, e.专业名称, e.计划数, e.所在地, a.平均分, s.学科评估, r.学校排名
+)
+SELECT 院校名称, 专业名称, 所在地, 招生人数, 平均分, 加权得分
+FROM (
+    SELECT 院校名称, 专业名称, 所在地, 招生人数, 平均分,
+           {_WEIGHTED_SCORE.format(p="", assessment="学科评估")} AS 加权得分
+    FROM 基础数据
+    WHERE 招生人数 > 0 AND 平均分 < %(score)s + {SCORE_CEILING}
+) t
+WHERE 加权得分 >= {MIN_WEIGHTED_SCORE}
+ORDER BY 加权得分 DESC, 平均分 DESC
+"""
+
+# 物化的“基础数据”表（由 recommend_base.py refresh 生成），列结构变化时递增 BASE_SCHEMA_VERSION
+BASE_TABLE = "tianjin_recommend_base"
+BASE_META_TABLE = "tianjin_recommend_base_meta"
+BASE_SCHEMA_VERSION = 2
+
+# 有意向专业时，学科评估只看名称包含该专业的学科，不能用物化表中预先算好的最好等级
+_MAJOR_ASSESSMENT_JOIN = f"""
+    LEFT JOIN (
+        SELECT 校名, MAX(CASE 评选结果 {_GRADE_CASE} ELSE {OTHER_GRADE_SCORE} END) AS 学科评估
+        FROM subject_assessment
+        WHERE 学科 LIKE %(assessment_like)s
+        GROUP BY 校名
+    ) s ON b.院校名称 = s.校名"""
+
+_BASE_RECOMMEND_SQL = f"""
+SELECT 院校名称, 专业名称, 所在地, 招生人数, 平均分, MAX(加权得分) AS 最高得分
+FROM (
+    SELECT b.院校名称, b.专业名称, b.所在地, b.招生人数, b.平均分,
+           {{weighted}} AS 加权得分
+    FROM {BASE_TABLE} b{{join}}
+    WHERE b.平均分 < %(score)s + {SCORE_CEILING}
+      AND (b.科目掩码 & ~%(student_mask)s) = 0
+      AND (b.任选掩码 = 0 OR (b.任选掩码 & %(student_mask)s) <> 0)
+      AND b.专业名称 LIKE %(major_like)s
+) t
+GROUP BY 院校名称, 专业名称, 招生人数, 所在地, 平均分
+HAVING MAX(加权得分) >= {MIN_WEIGHTED_SCORE}
+ORDER BY MAX(加权得分) DESC, 平均分 DESC
+"""
+BASE_RECOMMEND_SQL = _BASE_RECOMMEND_SQL.format(
+    weighted=_WEIGHTED_SCORE.format(p="b.", assessment="b.学科评估"), join="")
+BASE_RECOMMEND_MAJOR_SQL = _BASE_RECOMMEND_SQL.format(
+    weighted=_WEIGHTED_SCORE.format(p="b.", assessment=f"COALESCE(s.学科评估, {OTHER_GRADE_SCORE})"),
+    join=_MAJOR_ASSESSMENT_JOIN)
+
+REQUIREMENTS_SQL = "SELECT DISTINCT 科目要求 FROM {table}"  # 实时查询时按选科掩码挑出可报的取值
+
+# 源表的校验和：物化表记录刷新时的值，不一致说明源数据已更新、物化表过期
+SOURCE_TABLES = ("tianjin_enrollment_plan", "tianjin_college_admission", "subject_assessment", "common_ranking")
+CHECKSUM_SQL = "CHECKSUM TABLE " + ", ".join(SOURCE_TABLES)
+BASE_META_SQL = f"SELECT version, schema_version, source_checksum FROM {BASE_META_TABLE} WHERE id = 1"
+
+# 首次推荐时确定：物化表可用则记录其版本，否则为空字符串（使用实时查询）；以及“科目要求”的全部取值
+_base_version: Optional[str] = None
+_requirement_values: Optional[List[str]] = None
+
+
+def connect():
+    return pymysql.connect(
+        host=config['database']['host'],
+        port=config.getint('database', 'port', fallback=3306),
+        database=config['database']['database_college'],
+        user=config['database']['user'],
+        password=config['database']['password'],
+        charset='utf8mb4'
+    )
+
+
+def query(sql: str, args=None) -> Sequence[tuple]:
+    """在 tianjin 库上执行一条参数化查询（同步，需经 executor 调用）"""
+    connection = connect()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, args)
+            return cursor.fetchall()
+    finally:
+        connection.close()
+
+
+def parse_strategy(strategy: str) -> Tuple[Tuple[float, ...], str]:
+    """“城市优先：北京” / “城市优先:北京” -> (城市优先的权重, "北京")；未知策略按科目优先处理"""
+    name, _, city = (strategy or "").replace("：", ":").partition(":")
+    weights = STRATEGY_WEIGHTS.get(name.strip(), STRATEGY_WEIGHTS["科目优先"])
+    return weights, city.strip() if weights[4] else ""
+
+
+def parse_subjects(subjects: str) -> frozenset:
+    """“物理,化学,政治” -> {"物理", "化学", "思想政治"}"""
+    names = (s.strip() for s in re.split(r"[,，、\s]+", subjects or ""))
+    return frozenset(SUBJECT_ALIASES.get(name, name) for name in names if name)
+
+
+def subject_mask(names: Iterable[str]) -> int:
+    mask = 0
+    for name in names:
+        mask |= SUBJECT_BITS.get(SUBJECT_ALIASES.get(name, name), UNKNOWN_SUBJECT_BIT)
+    return mask
+
+
+def requirement_mask(requirement: str) -> Tuple[int, int]:
+    """“不限” -> (0, 0)；“物理加化学” -> (物理|化学, 0)；“物理或化学或生物” -> (0, 物理|化学|生物)"""
+    requirement = (requirement or "").strip()
+    if requirement in ("", "不限"):
+        return 0, 0
+    if "或" in requirement:
+        any_of = subject_mask(s.strip() for s in requirement.split("或"))
+        # 任选科目全都无法识别时无法满足，与必选了无法识别的科目相同；否则忽略其中无法识别的科目
+        if any_of == UNKNOWN_SUBJECT_BIT:
+            return UNKNOWN_SUBJECT_BIT, 0
+        return 0, any_of & ~UNKNOWN_SUBJECT_BIT
+    return subject_mask(s.strip() for s in requirement.split("加")), 0
+
+
+def student_mask(subjects: str) -> int:
+    """考生选科 -> 掩码，无法识别的名称忽略"""
+    return subject_mask(parse_subjects(subjects)) & ~UNKNOWN_SUBJECT_BIT
+
+
+def mask_eligible(required: int, any_of: int, student: int) -> bool:
+    """必选科目都已选考，且有任选要求时至少选考了其中一门"""
+    return (required & ~student) == 0 and (any_of == 0 or any_of & student != 0)
+
+
+def eligible_requirements(student: int, values: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(v for v in values if mask_eligible(*requirement_mask(v), student)) or ("不限",)
+
+
+def group_by_school_min_score_sum_enroll(results):
+    """
+    results: List[Tuple]，每个元组格式为
+    (院校名称, 专业名称, 所在地, 招生人数, 平均分, ...)
+    返回：List[Dict]，每个dict包含院校名称、总招生人数、平均分（各专业中的最高值）
+    """
+    school_data = defaultdict(lambda: {'招生人数': 0, '平均分': 0})
+
+    for row in results:
+        school = row[0]
+        enroll = int(row[3])
+        avg_score = float(row[4])
+        school_data[school]['招生人数'] += enroll
+        if school_data[school]['平均分'] is None or avg_score >= school_data[school]['平均分']:
+            school_data[school]['平均分'] = avg_score
+
+    grouped = []
+    for school, data in school_data.items():
+        grouped.append({
+            '院校名称': school,
+            '总招生人数': data['招生人数'],
+            '平均分': data['平均分']
+        })
+    return grouped
+
+
+def split_to_chong_wen_bao(grouped_results, score):
+    """
+    grouped_results: List[Dict]，每个dict包含'院校名称'、'总招生人数'、'平均分'
+    score: float，考生分数
+    返回：冲、稳、保三组列表
+    """
+    chong, wen, bao = [], [], []
+    for item in grouped_results:
+        avg = item['平均分']
+        if avg > score:
+            chong.append(item)
+        elif score - 10 <= avg <= score:
+            wen.append(item)
+        else:
+            bao.append(item)
+    return chong, wen, bao
+
+
+def calc_prob(item, score, mode):
+    avg = item['平均分']
+    enroll = item['总招生人数']
+    enroll = max(enroll, 1)  # 防止log(0)
+    if mode == 'chong':
+        prob = 40 - (avg - score) * 4 + math.log(enroll) * 2
+        prob = max(prob, 20)
+    elif mode == 'wen':
+        prob = 60 + (score - avg) * 4 + math.log(enroll) * 2
+        prob = min(prob, 90)
+    else:  # bao
+        prob = 90 + (score - avg) * 0.5 + math.log(enroll) * 1
+        prob = min(prob, 99)
+    return round(prob, 1)
+
+
+def build_tiers(results, score, top: int = TOP_PER_TIER) -> Dict[str, List[dict]]:
+    """按加权得分排好序的专业行 -> 冲一冲 / 稳一稳 / 保一保，每档保留前 top 所院校并附录取概率"""
+    chong, wen, bao = split_to_chong_wen_bao(group_by_school_min_score_sum_enroll(results), score)
+    tiers = {}
+    for name, items, mode in (("冲一冲", chong, 'chong'), ("稳一稳", wen, 'wen'), ("保一保", bao, 'bao')):
+        items = items[:top]
+        for item in items:
+            item['录取概率'] = f"{calc_prob(item, score, mode)}%"
+        tiers[name] = items
+    return tiers
+
+
+def build_params(score: float, strategy: str, subjects: str, want_major: str,
+                 requirement_values: Iterable[str] = ()) -> dict:
+    """requirement_values 为实时查询筛选“科目要求”用的取值；物化表直接用 student_mask 按位筛选"""
+    weights, city = parse_strategy(strategy)
+    student = student_mask(subjects)
+    major = (want_major or "").replace("%", "").replace("_", "").strip()
+    return {
+        "score": float(score),
+        "requirements": eligible_requirements(student, requirement_values),
+        "student_mask": student,
+        "major_like": f"%{major}%",
+        "assessment_like": f"%{major}%",
+        "w_score": weights[0], "w_assessment": weights[1], "w_rank": weights[2],
+        "w_scale": weights[3], "w_city": weights[4],
+        "city": city,
+    }
+
+
+def source_checksum() -> str:
+    """四张源表 CHECKSUM TABLE 结果的摘要（同步）"""
+    rows = query(CHECKSUM_SQL)
+    return hashlib.sha1(repr(sorted((str(t), str(c)) for t, c in rows)).encode("utf-8")).hexdigest()
+
+
+def fresh_base_version() -> str:
+    """物化表存在、列结构匹配且源表未变化时返回其版本号，否则返回空字符串（同步）"""
+    try:
+        meta = query(BASE_META_SQL)
+    except pymysql.err.ProgrammingError:
+        return ""
+    if not meta:
+        return ""
+    version, schema_version, checksum = meta[0]
+    if int(schema_version) != BASE_SCHEMA_VERSION or checksum != source_checksum():
+        return ""
+    return version
+
+
+def reset():
+    """重新检查物化表和“科目要求”取值（刷新物化表或更新源数据后调用）"""
+    global _base_version, _requirement_values
+    _base_version = None
+    _requirement_values = None
+
+
+async def base_version() -> str:
+    global _base_version
+    if _base_version is None:
+        _base_version = await executor.run_blocking("mysql", fresh_base_version) if use_materialized else ""
+        if use_materialized and not _base_version:
+            print("推荐物化表不存在或已过期，使用实时查询；可执行 python recommend_base.py refresh")
+    return _base_version
+
+
+async def requirement_values() -> List[str]:
+    global _requirement_values
+    if _requirement_values is None:
+        rows = await executor.run_blocking("mysql", query, REQUIREMENTS_SQL.format(table="tianjin_enrollment_plan"))
+        _requirement_values = [row[0] for row in rows]
+    return _requirement_values
+
+
+async def recommend(score: float, strategy: str, subjects: str, want_major: str = "") -> Dict[str, List[dict]]:
+    """返回 {"冲一冲": [...], "稳一稳": [...], "保一保": [...]}，格式与原 DeepSeekChatService.chat 相同"""
+    if await base_version():
+        params = build_params(score, strategy, subjects, want_major)
+        sql = BASE_RECOMMEND_MAJOR_SQL if params["major_like"] != "%%" else BASE_RECOMMEND_SQL
+    else:
+        params = build_params(score, strategy, subjects, want_major, await requirement_values())
+        sql = RECOMMEND_SQL
+    rows = await executor.run_blocking("mysql", query, sql, params)
+    return build_tiers(rows, float(score))
+
+
+NARRATIVE_PROMPT = """你是高考志愿填报顾问。考生分数 {score}，填报策略“{strategy}”，意向专业“{major}”。
+系统已按确定的规则算出以下推荐（录取概率为估算值）：
+{tiers}
+请用 150 字以内向考生说明这份推荐的特点和填报建议，不要改动或补充院校。"""
+
+
+async def narrate(tiers: Dict[str, List[dict]], score: float, strategy: str, want_major: str) -> str:
+    """为推荐结果生成一段说明；推荐结果本身不依赖大模型"""
+    import llm_clients
+    from llm_metrics import site
+
+    model = llm_clients.get_chat_model("deepseek", temperature=0.3)
+    prompt = NARRATIVE_PROMPT.format(score=score, strategy=strategy, major=want_major or "不限",
+                                     tiers=json.dumps(tiers, ensure_ascii=False))
+    async with executor.limit("llm"):
+        response = await model.ainvoke(prompt, config=site("recommend_engine.narrate"))
+    return response.content
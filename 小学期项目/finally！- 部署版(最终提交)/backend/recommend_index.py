@@ -0,0 +1,232 @@
+"""
+院校推荐的内存列式索引：招生计划、录取成绩、学科评估、院校排名四张表在启动时读取一次，
+整理成按平均分升序排列的 NumPy 列；一次推荐只做
+1. 二分查找截取分数窗口（平均分 < 考生分数 + 20，下界为加权和不可能达到 0.3 的位置）
+2. 在窗口内用一个向量表达式计算加权得分（公式见 recommend_engine），选科用位掩码一次判断全部行
+3. 按院校聚合后取冲 / 稳 / 保各档前 5 所
+结果与 recommend_engine 的参数化 SQL 一致，招生数据在一个填报季内不变，更新数据库后调用 reload_index()
+物化表（recommend_base.py）可用时直接读取其中已带类型的列
+"""
+import asyncio
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import recommend_engine
+from recommend_engine import (GRADE_SCORES, MIN_WEIGHTED_SCORE, OTHER_GRADE_SCORE, SCORE_CEILING, TOP_PER_TIER,
+                              calc_prob, parse_strategy, requirement_mask, student_mask)
+
+logger = logging.getLogger(__name__)
+
+PLAN_SQL = "SELECT 院校名称, 专业名称, 所在地, 计划数, 科目要求 FROM tianjin_enrollment_plan"
+ADMISSION_SQL = "SELECT 院校名称, AVG(总成绩) FROM tianjin_college_admission GROUP BY 院校名称"
+ASSESSMENT_SQL = "SELECT 校名, 学科, 评选结果 FROM subject_assessment"
+RANKING_SQL = "SELECT 院校, 排名 FROM common_ranking"
+BASE_SQL = f"SELECT 院校名称, 专业名称, 所在地, 科目要求, 招生人数, 平均分, 学校排名 FROM {recommend_engine.BASE_TABLE}"
+
+# 按意向专业缓存的专业名称筛选和学科评估数组
+MAJOR_CACHE_SIZE = 256
+
+
+def _plan_count(text) -> int:
+    """与 CAST(REPLACE(计划数, ',', '') AS UNSIGNED) 相同：去掉逗号后取开头的数字"""
+    match = re.match(r"\d+", str(text or "").replace(",", "").strip())
+    return int(match.group()) if match else 0
+
+
+class RecommendIndex:
+    """只读的列式索引，所有请求共享；重新加载时整体替换"""
+
+    def __init__(self, base_rows, assessment_rows, source: str = "tables", version: str = ""):
+        """
+        base_rows: (院校名称, 专业名称, 所在地, 科目要求, 招生人数, 平均分, 学校排名或None)，即物化表的各列
+        assessment_rows: (校名, 学科, 评选结果)，按意向专业计算学科评估时使用
+        """
+        rows = sorted(((float(avg), school, major, city, int(plan), requirement.strip(), rank)
+                       for school, major, city, requirement, plan, avg, rank in base_rows),
+                      key=lambda row: row[:6])
+        self.source = source
+        self.version = version
+
+        self.schools: List[str] = sorted({row[1] for row in rows})
+        school_ids = {name: i for i, name in enumerate(self.schools)}
+        self.cities: List[str] = sorted({row[3] for row in rows})
+        self.city_ids = city_ids = {name: i for i, name in enumerate(self.cities)}
+        self.requirements: List[str] = sorted({row[5] for row in rows})
+        # 每种“科目要求”只解析一次，再按行展开成 (必选掩码, 任选掩码) 两列
+        masks = {name: requirement_mask(name) for name in self.requirements}
+        key_ids = {}
+
+        self.avg = np.array([row[0] for row in rows], dtype=np.float64)
+        self.school = np.array([school_ids[row[1]] for row in rows], dtype=np.int32)
+        self.major = [row[2] for row in rows]
+        self.city = np.array([city_ids[row[3]] for row in rows], dtype=np.int32)
+        self.plan = np.array([row[4] for row in rows], dtype=np.int64)
+        self.required = np.array([masks[row[5]][0] for row in rows], dtype=np.uint8)
+        self.any_of = np.array([masks[row[5]][1] for row in rows], dtype=np.uint8)
+        self.key = np.array([key_ids.setdefault(row[1:5], len(key_ids)) for row in rows], dtype=np.int64)
+        # 同一分组出现多行（科目要求不同）时需要去重，绝大多数请求不会碰到
+        self.duplicated = np.bincount(self.key, minlength=len(key_ids))[self.key] > 1
+
+        self.scale = np.log(self.plan + 1) / np.log(100)
+        school_rank = np.full(len(self.schools), 500.0)
+        for row in rows:
+            if row[6] is not None:
+                school_rank[school_ids[row[1]]] = float(row[6])
+        self.rank_score = np.maximum(1 - school_rank / 500, 0)[self.school]
+
+        self.assessment_rows = [(school_ids[school], subject or "", GRADE_SCORES.get(grade, OTHER_GRADE_SCORE))
+                                for school, subject, grade in assessment_rows if school in school_ids]
+        self._major_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._major_lock = threading.Lock()
+        self.max_scale = float(self.scale.max()) if len(rows) else 0.0
+        self.loaded_at = time.time()
+
+    @classmethod
+    def from_tables(cls, plan_rows, admission_rows, assessment_rows, ranking_rows) -> "RecommendIndex":
+        """物化表不可用时，直接从四张源表的原始行算出与物化表相同的各列"""
+        averages = {school: float(avg) for school, avg in admission_rows if avg is not None}
+        rank = {}
+        for school, value in ranking_rows:
+            value = str(value or "").strip()
+            if value.isdigit():
+                rank[school] = min(int(value), rank.get(school, int(value)))
+        base_rows = set()
+        for school, major, city, plan, requirement in plan_rows:
+            plan = _plan_count(plan)
+            if school in averages and plan > 0:
+                base_rows.add((school, major, city, requirement.strip(), plan, averages[school], rank.get(school)))
+        return cls(base_rows, assessment_rows)
+
+    def __len__(self):
+        return len(self.avg)
+
+    def info(self) -> dict:
+        return {"source": self.source, "version": self.version, "rows": len(self), "schools": len(self.schools),
+                "requirements": len(self.requirements), "loaded_at": self.loaded_at}
+
+    def _for_major(self, major: str):
+        """意向专业 -> (专业名称筛选掩码 或 None, 每所院校的学科评估得分)，按专业缓存"""
+        with self._major_lock:
+            cached = self._major_cache.get(major)
+            if cached is not None:
+                self._major_cache.move_to_end(major)
+                return cached
+        mask = np.array([major in name for name in self.major], dtype=bool) if major else None
+        assessment = np.full(len(self.schools), -np.inf)
+        for school, subject, value in self.assessment_rows:
+            if major in subject and value > assessment[school]:
+                assessment[school] = value
+        assessment[np.isinf(assessment)] = OTHER_GRADE_SCORE
+        with self._major_lock:
+            self._major_cache[major] = (mask, assessment)
+            if len(self._major_cache) > MAJOR_CACHE_SIZE:
+                self._major_cache.popitem(last=False)
+        return mask, assessment
+
+    def window(self, score: float, weights) -> slice:
+        """平均分 < score + 20；并去掉即使其余各项取满分、加权和也不到 0.3 的低分段"""
+        hi = int(np.searchsorted(self.avg, score + SCORE_CEILING, side="left"))
+        rest = weights[1] + weights[2] + weights[3] * self.max_scale + weights[4]
+        if weights[0] <= 0:
+            return slice(0, hi)
+        reach = 50 * (1 + (rest - MIN_WEIGHTED_SCORE) / weights[0])
+        lo = int(np.searchsorted(self.avg, score - reach, side="left"))
+        return slice(lo, hi)
+
+    def recommend(self, score: float, strategy: str, subjects: str, want_major: str = "",
+                  top: int = TOP_PER_TIER) -> Dict[str, List[dict]]:
+        score = float(score)
+        weights, city = parse_strategy(strategy)
+        student = np.uint8(student_mask(subjects))
+        major = (want_major or "").replace("%", "").replace("_", "").strip()
+        major_mask, assessment = self._for_major(major)
+
+        window = self.window(score, weights)
+        avg = self.avg[window]
+        school = self.school[window]
+        weighted = (weights[0] * (1 - np.abs(avg - score) / 50)
+                    + weights[1] * assessment[school]
+                    + weights[2] * self.rank_score[window]
+                    + weights[3] * self.scale[window])
+        if weights[4] and city in self.city_ids:
+            weighted += weights[4] * (self.city[window] == self.city_ids[city])
+
+        # 选科筛选：必选科目都已选考，且有任选要求时至少选考其一
+        any_of = self.any_of[window]
+        keep = (((self.required[window] & ~student) == 0) & ((any_of == 0) | ((any_of & student) != 0))
+                & (weighted >= MIN_WEIGHTED_SCORE))
+        if major_mask is not None:
+            keep &= major_mask[window]
+        rows = np.nonzero(keep)[0]
+        if self.duplicated[window][rows].any():
+            _, first = np.unique(self.key[window][rows], return_index=True)
+            rows = rows[np.sort(first)]
+
+        school = school[rows]
+        n = len(self.schools)
+        total = np.bincount(school, weights=self.plan[window][rows], minlength=n)
+        best_avg = np.full(n, -np.inf)
+        np.maximum.at(best_avg, school, avg[rows])
+        best_weighted = np.full(n, -np.inf)
+        np.maximum.at(best_weighted, school, weighted[rows])
+
+        # 院校按其最高加权得分排序，相同时平均分高的在前（与 SQL 的 ORDER BY 一致）
+        candidates = np.unique(school)
+        order = candidates[np.lexsort((-best_avg[candidates], -best_weighted[candidates]))]
+        order_avg = best_avg[order]
+        tiers = {}
+        for name, mode, selected in (("冲一冲", 'chong', order_avg > score),
+                                     ("稳一稳", 'wen', (order_avg >= score - 10) & (order_avg <= score)),
+                                     ("保一保", 'bao', order_avg < score - 10)):
+            items = []
+            for i in order[selected][:top]:
+                item = {'院校名称': self.schools[i], '总招生人数': int(total[i]), '平均分': float(best_avg[i])}
+                item['录取概率'] = f"{calc_prob(item, score, mode)}%"
+                items.append(item)
+            tiers[name] = items
+        return tiers
+
+
+def load_index() -> RecommendIndex:
+    """物化表可用且未过期时只读物化表和学科评估，否则读取四张源表"""
+    query = recommend_engine.query
+    version = recommend_engine.fresh_base_version() if recommend_engine.use_materialized else ""
+    if version:
+        return RecommendIndex(query(BASE_SQL), query(ASSESSMENT_SQL), source="materialized", version=version)
+    return RecommendIndex.from_tables(query(PLAN_SQL), query(ADMISSION_SQL), query(ASSESSMENT_SQL), query(RANKING_SQL))
+
+
+_index: Optional[RecommendIndex] = None
+_lock = threading.Lock()
+
+
+def reload_index() -> RecommendIndex:
+    """重新读取四张表并原子替换当前索引，正在处理的请求继续使用旧索引"""
+    global _index
+    with _lock:
+        start = time.perf_counter()
+        index = load_index()
+        _index = index
+        logger.info(f"推荐索引已加载: 行数={len(index)}, 院校={len(index.schools)}, "
+                    f"耗时={time.perf_counter() - start:.3f}s")
+    return index
+
+
+async def get_index() -> RecommendIndex:
+    """获取当前索引，尚未加载时在线程中加载"""
+    index = _index
+    if index is None:
+        index = await asyncio.to_thread(reload_index)
+    return index
+
+
+async def recommend(score: float, strategy: str, subjects: str, want_major: str = "") -> Dict[str, List[dict]]:
+    """与 recommend_engine.recommend 相同的输入输出，计算在内存中完成，不访问数据库"""
+    index = await get_index()
+    return index.recommend(score, strategy, subjects, want_major)
@@ -0,0 +1,127 @@
+"""
+推荐对话的近似重复问题缓存：同一学生画像 + 同一推荐结果 + 同样的对话历史下，问题向量的余弦相似度达到阈值即复用已生成的回答
+问题向量为字符 n-gram 哈希向量（纯 NumPy、本地 CPU 计算，不调用 embedding 接口）
+
+n-gram 向量只能识别字面上的近似（标点、语气词、少量增删字），无法区分“南开大学/天津大学”这类只差实体名的问题，
+因此默认阈值较高，并且需要显式开启（config.ini [cache] chat_semantic_enabled 或请求参数 semantic_cache）
+"""
+import configparser
+import hashlib
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from kg_classifier import char_ngrams
+
+config = configparser.ConfigParser()
+config.read('config.ini')
+
+
+def embed(text: str, dim: int = 4096) -> np.ndarray:
+    """字符 1~3 gram 哈希到 dim 维，次线性词频后 L2 归一化"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for gram in char_ngrams(text.lower(), 1, 3):
+        vector[zlib.crc32(gram.encode("utf-8")) % dim] += 1
+    np.log1p(vector, out=vector)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    chunks: List[str]
+    latency: float  # 原始生成耗时（秒），命中时计入节省的时间
+    created: float
+
+
+class SemanticCache:
+    def __init__(self, threshold: float = 0.9, ttl: float = 3600, max_contexts: int = 256,
+                 max_per_context: int = 64, dim: int = 4096):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_contexts = max_contexts
+        self.max_per_context = max_per_context
+        self.dim = dim
+        # 上下文键 -> (问题向量矩阵, 回答列表)；上下文按 LRU 淘汰
+        self._contexts: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def context_key(profile: str, recommendation: str, history: Sequence = ()) -> str:
+        """
+        学生画像、推荐结果和此前的对话共同决定上下文，任一变化都不会命中旧回答
+        追问（如“它的就业怎么样”）的含义取决于前面的对话，较早的轮次也会进入摘要，因此对全部历史取摘要
+        """
+        digest = hashlib.sha256(f"{profile}\n{recommendation}".encode("utf-8"))
+        for turn in history:
+            for text in turn[:2]:
+                encoded = str(text).encode("utf-8")
+                # 带长度前缀，避免不同的切分拼出相同的字节串
+                digest.update(len(encoded).to_bytes(8, "little") + encoded)
+        return digest.hexdigest()
+
+    def lookup(self, context: str, question: str) -> Optional[CachedAnswer]:
+        vector = embed(question, self.dim)
+        now = time.time()
+        with self._lock:
+            entry = self._contexts.get(context)
+            if entry is not None:
+                matrix, answers = entry
+                alive = [i for i, a in enumerate(answers) if a.created + self.ttl > now]
+                if len(alive) < len(answers):
+                    matrix, answers = matrix[alive], [answers[i] for i in alive]
+                    self._contexts[context] = (matrix, answers)
+                if answers:
+                    scores = matrix @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        self._contexts.move_to_end(context)
+                        self.hits += 1
+                        self.saved_seconds += answers[best].latency
+                        return answers[best]
+            self.misses += 1
+            return None
+
+    def store(self, context: str, question: str, chunks: List[str], latency: float):
+        vector = embed(question, self.dim)[None, :]
+        answer = CachedAnswer(question, chunks, latency, time.time())
+        with self._lock:
+            matrix, answers = self._contexts.get(context, (np.empty((0, self.dim), dtype=np.float32), []))
+            matrix, answers = np.vstack([matrix, vector])[-self.max_per_context:], (answers + [answer])[-self.max_per_context:]
+            self._contexts[context] = (matrix, answers)
+            self._contexts.move_to_end(context)
+            while len(self._contexts) > self.max_contexts:
+                self._contexts.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._contexts.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "contexts": len(self._contexts),
+                "answers": sum(len(answers) for _, answers in self._contexts.values()),
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+
+chat_cache_enabled = config.getboolean('cache', 'chat_semantic_enabled', fallback=False)
+chat_cache = SemanticCache(
+    threshold=config.getfloat('cache', 'chat_semantic_threshold', fallback=0.9),
+    ttl=config.getfloat('cache', 'chat_semantic_ttl', fallback=3600),
+)
@@ -0,0 +1,108 @@
+"""
+合并并发的相同请求：同一个键同时只向上游发起一次调用，其余请求等待并共享结果
+- SingleFlight.do：普通协程，跟随者拿到同一个返回值（或同一个异常）
+- StreamFanout.stream：流式调用，上游每产生一个分块就分发给所有订阅者；晚加入的订阅者先补发已有分块
+
+上游调用在独立任务中执行，某个请求断开（被取消）不会中断其他请求共享的调用；
+流式调用的订阅者全部离开、上游还没结束时取消上游（关闭上游生成器），不再为没人读取的分块付费
+"""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {"inflight": len(self._inflight), "leaders": self.leaders, "followers": self.followers}
+
+
+class _Broadcast:
+    """一次上游流式调用：缓存已产生的分块，新分块到达时唤醒所有订阅者"""
+
+    def __init__(self, source: AsyncIterator[Any]):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._changed = asyncio.Condition()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[Any]):
+        try:
+            async for item in source:
+                async with self._changed:
+                    self.chunks.append(item)
+                    self._changed.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            # 被取消时关闭上游生成器，使其 finally（释放连接等）立即执行
+            if hasattr(source, "aclose"):
+                await source.aclose()
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.chunks) or self.done)
+                pending = self.chunks[index:]
+                finished = self.done
+            for item in pending:
+                yield item
+            index += len(pending)
+            if finished and index >= len(self.chunks):
+                break
+        if self.error is not None and not isinstance(self.error, asyncio.CancelledError):
+            raise self.error
+
+
+class StreamFanout:
+    def __init__(self):
+        self._inflight: Dict[Hashable, _Broadcast] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def stream(self, key: Hashable, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        broadcast = self._inflight.get(key)
+        if broadcast is None:
+            self.leaders += 1
+            broadcast = _Broadcast(fn())
+            self._inflight[key] = broadcast
+            broadcast.task.add_done_callback(lambda _: self._forget(key, broadcast))
+        else:
+            self.followers += 1
+        broadcast.subscribers += 1
+        try:
+            async for item in broadcast.subscribe():
+                yield item
+        finally:
+            broadcast.subscribers -= 1
+            # 最后一个订阅者离开时上游仍在生成：取消它，之后相同的键重新发起调用
+            if broadcast.subscribers == 0 and not broadcast.done:
+                broadcast.task.cancel()
+                self._forget(key, broadcast)
+
+    def _forget(self, key: Hashable, broadcast: _Broadcast):
+        if self._inflight.get(key) is broadcast:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {"inflight": len(self._inflight), "leaders": self.leaders, "followers": self.followers}
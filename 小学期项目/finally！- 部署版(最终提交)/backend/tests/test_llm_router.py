@@ -0,0 +1,79 @@
+"""
+HedgedRouter 的统计：每次路由调用只记一次成功或失败，流式调用在流结束后才记
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import llm_router
+from llm_router import HedgedRouter
+
+
+class FakeModel:
+    def __init__(self, chunks=("你", "好"), fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+
+    async def ainvoke(self, input, config=None):
+        return SimpleNamespace(content="".join(self.chunks))
+
+    async def astream(self, input, config=None):
+        for i, text in enumerate(self.chunks):
+            if i == self.fail_after:
+                raise RuntimeError("连接中断")
+            yield SimpleNamespace(content=text)
+
+
+def outcomes(router, name):
+    metric = llm_router.hedges_total._values
+    return {outcome: metric.get((router.name, name, outcome), 0) for outcome in ("won", "error")}
+
+
+@pytest.fixture
+def router_name(request):
+    return f"test-{request.node.name}"
+
+
+async def consume(router):
+    return [chunk.content async for chunk in router.astream("问题")]
+
+
+def test_stream_success_counted_once(router_name):
+    router = HedgedRouter(router_name, [("a", FakeModel())])
+    assert asyncio.run(consume(router)) == ["你", "好"]
+    stats = router.stats["a"]
+    assert list(stats.outcomes) == [1] and len(stats.ttft) == 1 and not stats.latency
+    assert outcomes(router, "a") == {"won": 1, "error": 0}
+
+
+def test_mid_stream_failure_counted_once(router_name):
+    router = HedgedRouter(router_name, [("a", FakeModel(chunks=("你", "好", "吗"), fail_after=2))],
+                          failure_threshold=1)
+    with pytest.raises(RuntimeError):
+        asyncio.run(consume(router))
+    stats = router.stats["a"]
+    assert list(stats.outcomes) == [0] and stats.consecutive_failures == 1
+    assert stats.open_until > 0
+    assert outcomes(router, "a") == {"won": 0, "error": 1}
+
+
+def test_consumer_stopping_early_is_not_a_failure(router_name):
+    router = HedgedRouter(router_name, [("a", FakeModel(chunks=("你", "好", "吗")))])
+
+    async def first_chunk():
+        stream = router.astream("问题")
+        async for chunk in stream:
+            await stream.aclose()
+            return chunk.content
+    assert asyncio.run(first_chunk()) == "你"
+    assert list(router.stats["a"].outcomes) == [1]
+    assert outcomes(router, "a") == {"won": 1, "error": 0}
+
+
+def test_invoke_records_latency_only(router_name):
+    router = HedgedRouter(router_name, [("a", FakeModel())])
+    assert asyncio.run(router.ainvoke("问题")).content == "你好"
+    stats = router.stats["a"]
+    assert list(stats.outcomes) == [1] and len(stats.latency) == 1 and not stats.ttft
+    assert outcomes(router, "a") == {"won": 1, "error": 0}
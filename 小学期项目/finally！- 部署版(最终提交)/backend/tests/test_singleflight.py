@@ -0,0 +1,93 @@
+"""
+StreamFanout：多个请求共享一次上游流式调用；有订阅者离开时上游继续，最后一个订阅者离开时关闭上游
+"""
+import asyncio
+
+from singleflight import StreamFanout
+
+
+class Upstream:
+    """记录产生了多少分块、是否被关闭的上游生成器"""
+
+    def __init__(self, chunks: int = 100):
+        self.chunks = chunks
+        self.produced = 0
+        self.closed = False
+        self.finished = False
+
+    async def generate(self):
+        try:
+            for i in range(self.chunks):
+                await asyncio.sleep(0.001)
+                self.produced += 1
+                yield i
+            self.finished = True
+        finally:
+            self.closed = True
+
+
+async def take(stream, n: int) -> list:
+    items = []
+    async for item in stream:
+        items.append(item)
+        if len(items) == n:
+            break
+    await stream.aclose()
+    return items
+
+
+def test_shared_stream_reaches_every_subscriber():
+    async def main():
+        fanout, upstream = StreamFanout(), Upstream(chunks=5)
+        first = fanout.stream("k", upstream.generate)
+        second = fanout.stream("k", upstream.generate)
+        results = await asyncio.gather(take(first, 5), take(second, 5))
+        return fanout, upstream, results
+
+    fanout, upstream, results = asyncio.run(main())
+    assert results == [list(range(5))] * 2
+    assert upstream.finished and fanout.stats() == {"inflight": 0, "leaders": 1, "followers": 1}
+
+
+def test_upstream_continues_while_another_subscriber_reads():
+    async def main():
+        fanout, upstream = StreamFanout(), Upstream(chunks=20)
+        leaving = fanout.stream("k", upstream.generate)
+        staying = fanout.stream("k", upstream.generate)
+        staying_task = asyncio.ensure_future(take(staying, 20))
+        await take(leaving, 2)
+        return upstream, await staying_task
+
+    upstream, items = asyncio.run(main())
+    assert items == list(range(20))
+    assert upstream.finished
+
+
+def test_upstream_closed_when_last_subscriber_leaves():
+    async def main():
+        fanout, upstream = StreamFanout(), Upstream(chunks=100)
+        first = fanout.stream("k", upstream.generate)
+        second = fanout.stream("k", upstream.generate)
+        await asyncio.gather(take(first, 2), take(second, 3))
+        await asyncio.sleep(0.01)
+        produced = upstream.produced
+        await asyncio.sleep(0.02)
+        return fanout, upstream, produced
+
+    fanout, upstream, produced = asyncio.run(main())
+    assert upstream.closed and not upstream.finished
+    assert upstream.produced == produced < 100
+    assert fanout.stats()["inflight"] == 0
+
+
+def test_new_request_after_cancel_starts_a_fresh_call():
+    async def main():
+        fanout, cancelled, fresh = StreamFanout(), Upstream(chunks=100), Upstream(chunks=3)
+        await take(fanout.stream("k", cancelled.generate), 1)
+        items = await take(fanout.stream("k", fresh.generate), 3)
+        return fanout, cancelled, fresh, items
+
+    fanout, cancelled, fresh, items = asyncio.run(main())
+    assert cancelled.closed and not cancelled.finished
+    assert items == [0, 1, 2] and fresh.finished
+    assert fanout.stats()["leaders"] == 2
@@ -0,0 +1,309 @@
+"""
+tianjin 库的列类型与索引迁移：
+- text 列改为合适长度的 VARCHAR；计划数改为 INT，得分改为 DECIMAL（'None' 改为 NULL）
+- common_ranking.排名 中有“医1”“财2”这类非数字名次，保留为 VARCHAR，另加存储生成列 名次（数字名次，否则 NULL）
+- 在推荐查询的关联键和筛选键上加组合索引（院校名称、科目要求、校名、学科、院校……）
+
+每列转换前先检查数据（长度、是否都是数字），不满足时中止，不会截断或丢失数据；已是目标类型的列、已存在的索引会跳过，可重复执行。
+迁移前后对推荐相关查询各执行一次 EXPLAIN 和计时，生成 Markdown 报告
+
+用法（在 backend 目录下运行，导入 database/backend_database/tianjin.sql 之后执行）：
+    python tianjin_migration.py plan                      # 只检查数据并打印将执行的语句
+    python tianjin_migration.py apply [--runs 20]         # 执行迁移，并写出前后对比报告
+    python tianjin_migration.py report [--runs 20]        # 只对当前库生成 EXPLAIN 与计时报告
+迁移会改变源表校验和，之后需执行 python recommend_base.py refresh 重新生成推荐物化表
+"""
+import argparse
+import os
+import re
+import statistics
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import recommend_base
+import recommend_engine
+import recommend_index
+
+REPORT_PATH = "output/tianjin_migration_report.md"
+
+
+class MigrationError(ValueError):
+    """数据不满足目标列类型，迁移中止"""
+
+
+class Column(NamedTuple):
+    name: str
+    type: str                       # 目标类型（information_schema.COLUMNS.COLUMN_TYPE 的写法）
+    nullable: bool = False
+    cleanup: Optional[str] = None   # 转换前对原值做的修正，{col} 为列名
+
+
+# 表 -> 目标列类型；未列出的列保持不变
+COLUMNS: Dict[str, List[Column]] = {
+    "tianjin_enrollment_plan": [
+        Column("所在地", "varchar(20)"),
+        Column("批次", "varchar(50)"),
+        Column("科目要求", "varchar(50)", cleanup="TRIM({col})"),
+        Column("院校名称", "varchar(50)"),
+        Column("院校专业组代码", "varchar(10)", cleanup="TRIM({col})"),
+        Column("专业代码", "varchar(10)"),
+        Column("专业名称", "varchar(255)"),
+        Column("专业备注", "varchar(500)", nullable=True),
+        Column("计划数", "int unsigned", cleanup="REPLACE(TRIM({col}), ',', '')"),
+        Column("学制", "varchar(10)"),
+        Column("收费标准", "varchar(20)"),  # 有“待定”等非数字取值，不转为数字
+    ],
+    "tianjin_college_admission": [
+        # 类型已是 varchar(10)，但取值带尾随空格，与招生计划中的代码对不上
+        Column("院校专业组代码", "varchar(10)", nullable=True, cleanup="TRIM({col})"),
+    ],
+    "common_ranking": [
+        Column("排名", "varchar(10)"),
+        Column("院校", "varchar(50)"),
+        Column("省份", "varchar(20)", nullable=True),
+        Column("类型", "varchar(20)", nullable=True),
+        Column("得分", "decimal(6,1)", nullable=True, cleanup="NULLIF(NULLIF(TRIM({col}), 'None'), '')"),
+    ],
+}
+
+# 表 -> [(列名, 定义)]，迁移时新增的列
+GENERATED_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "common_ranking": [
+        ("名次", "int unsigned GENERATED ALWAYS AS (IF(`排名` REGEXP '^[0-9]+$', CAST(`排名` AS UNSIGNED), NULL)) STORED"),
+    ],
+}
+
+# 表 -> [(索引名, 列)]
+INDEXES: Dict[str, List[Tuple[str, Sequence[str]]]] = {
+    "tianjin_enrollment_plan": [
+        ("idx_院校名称_科目要求", ("院校名称", "科目要求")),
+        ("idx_科目要求_院校名称", ("科目要求", "院校名称")),
+        ("idx_院校专业组代码", ("院校专业组代码",)),
+    ],
+    "tianjin_college_admission": [
+        ("idx_院校名称_总成绩", ("院校名称", "总成绩")),
+        ("idx_院校专业组代码", ("院校专业组代码",)),
+    ],
+    "subject_assessment": [
+        ("idx_校名_学科_评选结果", ("校名", "学科", "评选结果")),
+        ("idx_学科", ("学科",)),
+    ],
+    "common_ranking": [
+        ("idx_院校_名次", ("院校", "名次")),
+    ],
+}
+
+_NUMBER_PATTERNS = {"int": r"^[0-9]+$", "decimal": r"^-?[0-9]+(\.[0-9]+)?$"}
+
+
+def _quote(name: str) -> str:
+    return f"`{name}`"
+
+
+class Migration:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def fetch(self, sql: str, args=None) -> Sequence[tuple]:
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, args)
+            return cursor.fetchall()
+
+    def current_columns(self, table: str) -> Dict[str, Tuple[str, bool]]:
+        rows = self.fetch("SELECT COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE FROM information_schema.COLUMNS "
+                          "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (table,))
+        return {name: (str(column_type).lower(), nullable == "YES") for name, column_type, nullable in rows}
+
+    def current_indexes(self, table: str) -> set:
+        rows = self.fetch("SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+                          "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (table,))
+        return {row[0] for row in rows}
+
+    def check(self, table: str, column: Column):
+        """确认现有数据能无损转换为目标类型，否则抛出 MigrationError"""
+        value = (column.cleanup or "{col}").format(col=_quote(column.name))
+        kind = column.type.split("(")[0].split()[0]
+        problems = []
+        if not column.nullable:
+            nulls = self.fetch(f"SELECT COUNT(*) FROM {table} WHERE ({value}) IS NULL")[0][0]
+            if nulls:
+                problems.append(f"{nulls} 行为空")
+        if kind == "varchar":
+            limit = int(re.search(r"\((\d+)\)", column.type).group(1))
+            longest = self.fetch(f"SELECT MAX(CHAR_LENGTH({value})) FROM {table}")[0][0] or 0
+            if longest > limit:
+                problems.append(f"最长 {longest} 字符，超过 {limit}")
+        elif kind in _NUMBER_PATTERNS:
+            bad = self.fetch(f"SELECT ({value}) FROM {table} WHERE ({value}) IS NOT NULL "
+                             f"AND ({value}) NOT REGEXP %s LIMIT 5", (_NUMBER_PATTERNS[kind],))
+            if bad:
+                problems.append(f"存在非数字取值，如 {[row[0] for row in bad]}")
+        if problems:
+            raise MigrationError(f"{table}.{column.name} 不能转换为 {column.type}：{'；'.join(problems)}")
+
+    def plan(self) -> List[str]:
+        """检查数据并返回需要执行的语句；已完成的部分不再出现"""
+        statements = []
+        for table in sorted(set(COLUMNS) | set(GENERATED_COLUMNS) | set(INDEXES)):
+            columns = self.current_columns(table)
+            indexes = self.current_indexes(table)
+            relax, updates, alters = [], [], []
+            for column in COLUMNS.get(table, []):
+                current = columns.get(column.name)
+                if current is None:
+                    continue
+                col = _quote(column.name)
+                cleaned = column.cleanup.format(col=col) if column.cleanup else None
+                dirty = cleaned and self.fetch(f"SELECT COUNT(*) FROM {table} WHERE NOT ({col} <=> {cleaned})")[0][0]
+                retype = current != (column.type, column.nullable)
+                if not dirty and not retype:
+                    continue
+                self.check(table, column)
+                if dirty:
+                    updates.append(f"{col} = {cleaned}")
+                    if column.nullable and not current[1]:
+                        # 修正后的值可能为 NULL（如 'None'、空字符串），先放开非空约束
+                        relax.append(f"MODIFY {col} {current[0]} NULL")
+                if retype:
+                    alters.append(f"MODIFY {col} {column.type} {'DEFAULT NULL' if column.nullable else 'NOT NULL'}")
+            for name, definition in GENERATED_COLUMNS.get(table, []):
+                if name not in columns:
+                    alters.append(f"ADD COLUMN {_quote(name)} {definition}")
+            for name, keys in INDEXES.get(table, []):
+                if name not in indexes:
+                    alters.append(f"ADD INDEX {_quote(name)} ({', '.join(_quote(key) for key in keys)})")
+            if relax:
+                statements.append(f"ALTER TABLE {table}\n  " + ",\n  ".join(relax))
+            if updates:
+                statements.append(f"UPDATE {table} SET {', '.join(updates)}")
+            if alters:
+                statements.append(f"ALTER TABLE {table}\n  " + ",\n  ".join(alters))
+                statements.append(f"ANALYZE TABLE {table}")
+        return statements
+
+    def apply(self, statements: List[str]):
+        with self.connection.cursor() as cursor:
+            for sql in statements:
+                start = time.perf_counter()
+                cursor.execute(sql)
+                cursor.fetchall()
+                print(f"-- {time.perf_counter() - start:.2f}s\n{sql};\n")
+        self.connection.commit()
+
+    def explain(self, sql: str, args=None) -> Tuple[List[str], List[tuple]]:
+        with self.connection.cursor() as cursor:
+            cursor.execute("EXPLAIN " + sql, args)
+            return [d[0] for d in cursor.description], list(cursor.fetchall())
+
+    def timing(self, sql: str, args=None, runs: int = 20) -> dict:
+        samples = []
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, args)  # 预热
+            cursor.fetchall()
+            for _ in range(runs):
+                start = time.perf_counter()
+                cursor.execute(sql, args)
+                rows = cursor.fetchall()
+                samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        return {"rows": len(rows), "median_ms": round(statistics.median(samples), 2),
+                "p95_ms": round(samples[min(int(0.95 * len(samples)), len(samples) - 1)], 2)}
+
+
+def report_queries(migration: Migration) -> List[Tuple[str, str, Optional[dict]]]:
+    """推荐相关的查询：实时推荐（三种策略 / 有无意向专业）、物化表刷新、内存索引加载"""
+    values = [row[0] for row in migration.fetch(recommend_engine.REQUIREMENTS_SQL.format(
+        table="tianjin_enrollment_plan"))]
+    cases = [
+        ("实时推荐：科目优先，物理/化学/生物，不限专业", (600, "科目优先", "物理,化学,生物", "")),
+        ("实时推荐：院校优先，历史/政治/地理，意向法学", (560, "院校优先", "历史,政治,地理", "法学")),
+        ("实时推荐：城市优先：北京，物理/化学/生物，意向计算机", (620, "城市优先：北京", "物理,化学,生物", "计算机")),
+    ]
+    queries = [(title, recommend_engine.RECOMMEND_SQL, recommend_engine.build_params(*case, values))
+               for title, case in cases]
+    queries.append(("物化表刷新（recommend_base.py refresh 的查询部分）", recommend_base.SELECT_SQL, None))
+    queries.append(("内存索引加载：录取平均分", recommend_index.ADMISSION_SQL, None))
+    return queries
+
+
+def measure(migration: Migration, runs: int) -> List[dict]:
+    results = []
+    for title, sql, args in report_queries(migration):
+        header, plan = migration.explain(sql, args)
+        results.append({"title": title, "header": header, "plan": plan, "timing": migration.timing(sql, args, runs)})
+    return results
+
+
+def _plan_table(header: List[str], plan: List[tuple]) -> List[str]:
+    keep = [i for i, name in enumerate(header) if name in ("id", "select_type", "table", "type", "possible_keys",
+                                                            "key", "rows", "filtered", "Extra")]
+    lines = ["| " + " | ".join(header[i] for i in keep) + " |", "|" + "---|" * len(keep)]
+    for row in plan:
+        lines.append("| " + " | ".join("" if row[i] is None else str(row[i]) for i in keep) + " |")
+    return lines
+
+
+def write_report(path: str, before: Optional[List[dict]], after: List[dict], statements: List[str]):
+    lines = ["# tianjin 库迁移报告", "", f"生成时间：{time.strftime('%Y-%m-%d %H:%M:%S')}", ""]
+    if before is not None:
+        lines += ["## 耗时对比", "", "| 查询 | 迁移前中位数 (ms) | 迁移前 p95 (ms) | 迁移后中位数 (ms) | 迁移后 p95 (ms) | 返回行数 |",
+                  "|---|---|---|---|---|---|"]
+        for old, new in zip(before, after):
+            lines.append(f"| {new['title']} | {old['timing']['median_ms']} | {old['timing']['p95_ms']} | "
+                         f"{new['timing']['median_ms']} | {new['timing']['p95_ms']} | {new['timing']['rows']} |")
+        lines += ["", "## 执行的语句", "", "```sql"] + [f"{sql};" for sql in statements] + ["```", ""]
+    else:
+        lines += ["## 耗时", "", "| 查询 | 中位数 (ms) | p95 (ms) | 返回行数 |", "|---|---|---|---|"]
+        for new in after:
+            lines.append(f"| {new['title']} | {new['timing']['median_ms']} | {new['timing']['p95_ms']} | "
+                         f"{new['timing']['rows']} |")
+        lines.append("")
+    lines += ["## EXPLAIN", ""]
+    for i, new in enumerate(after):
+        lines += [f"### {new['title']}", ""]
+        if before is not None:
+            lines += ["迁移前：", ""] + _plan_table(before[i]["header"], before[i]["plan"]) + ["", "迁移后：", ""]
+        lines += _plan_table(new["header"], new["plan"]) + [""]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tianjin 库列类型与索引迁移")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("plan", help="检查数据并打印将执行的语句，不修改数据库")
+    apply_parser = sub.add_parser("apply", help="执行迁移并生成前后对比报告")
+    report_parser = sub.add_parser("report", help="只对当前库生成 EXPLAIN 与计时报告")
+    for p in (apply_parser, report_parser):
+        p.add_argument("--runs", type=int, default=20, help="每条查询计时的执行次数")
+        p.add_argument("--report", default=REPORT_PATH, help="报告输出路径")
+    args = parser.parse_args()
+
+    migration = Migration(recommend_engine.connect())
+    try:
+        if args.command == "report":
+            write_report(args.report, None, measure(migration, args.runs), [])
+            print(f"报告已写入 {args.report}")
+            return
+        try:
+            statements = migration.plan()
+        except MigrationError as e:
+            raise SystemExit(f"迁移中止：{e}")
+        if args.command == "plan":
+            print("\n\n".join(f"{sql};" for sql in statements) or "-- 已是最新结构，无需迁移")
+            return
+        if not statements:
+            print("-- 已是最新结构，无需迁移")
+            return
+        before = measure(migration, args.runs)
+        migration.apply(statements)
+        after = measure(migration, args.runs)
+        write_report(args.report, before, after, statements)
+        print(f"报告已写入 {args.report}；请执行 python recommend_base.py refresh 重新生成推荐物化表")
+    finally:
+        migration.connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
+import os
 import re
-from pyvis.network import Network
-from pyvis.options import Options
+import streamlit.components.v1 as components
+
+# 组件页面 lib/index.html 与 vendored 的 vis-network 放在同一目录，浏览器只加载一次
+_LIB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib")
+_kg_graph = components.declare_component("kg_graph", path=_LIB_DIR)
 
 def to_triplets(str_list: list):
     """
@@ -32,49 +36,36 @@ def extract_kg_triplets(file_path):
     entity_ref_triplets = to_triplets(entity_ref)
     return entity_triplets, entity_propert_triplets, entity_ref_triplets
 
-def display_graph_pyvis(options=0, triplets = []):
+def build_graph_data(triplets=None, nodes=None, edges=None):
     """
-    使用 Pyvis 库绘制知识图谱
-    :param options:     绘图选项，0 为默认选项，1 为简化选项
-    :param triplets:    四元组列表，每个四元组格式为 (实体, 属性, 值, 关系)
-    :return:    返回生成的 HTML 字符串
+    转换成绘图组件使用的紧凑格式
+    :param triplets:    四元组列表，每个四元组格式为 (类型, 主体, 关系, 客体)，只绘制"实体关系"
+    :param nodes:       后端给出的节点名列表（与 edges 一起传入时不再从四元组推导）
+    :param edges:       后端给出的边列表，每条为 (主体, 关系, 客体)
+    :return:    (节点名列表, [[起点下标, 终点下标, 关系], ...])
     """
-    # 对四元组去重
-    unique_triplets = list({tuple(t) for t in triplets})
-    entity_ref_triplets = unique_triplets
-
-    g = Network(height="600px", width="1000px", directed=True)
-    g.options = Options(options)
+    if edges is None:
+        edges = [t[1:4] for t in dict.fromkeys(tuple(t) for t in (triplets or [])) if t[0] == "实体关系"]
     nodes_id = {}
-    nodes_exist = []
-    # 先收集所有节点，分配id
-    for triplet in entity_ref_triplets:
-        if triplet[0] == "实体":
-            sub = triplet[1]
-            obj = triplet[3]
-            if sub not in nodes_id:
-                nodes_id[sub] = len(nodes_id)
-            if obj not in nodes_id:
-                nodes_id[obj] = len(nodes_id)
-        elif triplet[0] == "实体关系":
-            sub = triplet[1]
-            obj = triplet[3]
-            if sub not in nodes_id:
-                nodes_id[sub] = len(nodes_id)
-            if obj not in nodes_id:
-                nodes_id[obj] = len(nodes_id)
-    # 再添加节点和边
-    for triplet in entity_ref_triplets:
-        if triplet[0] == "实体关系":
-            sub = triplet[1]
-            rel = triplet[2]
-            obj = triplet[3]
-            if sub not in nodes_exist:
-                g.add_node(nodes_id[sub], label=sub)
-                nodes_exist.append(sub)
-            if obj not in nodes_exist:
-                g.add_node(nodes_id[obj], label=obj)
-                nodes_exist.append(obj)
-            title = "[{}] -[{}]-> [{}]".format(sub, rel, obj)
-            g.add_edge(nodes_id[sub], nodes_id[obj], title=title)
-    return g.generate_html()
\ No newline at end of file
+    for name in nodes or []:
+        nodes_id.setdefault(name, len(nodes_id))
+    compact_edges = []
+    for sub, rel, obj in dict.fromkeys(tuple(e) for e in edges):
+        for name in (sub, obj):
+            if name not in nodes_id:
+                nodes_id[name] = len(nodes_id)
+        compact_edges.append([nodes_id[sub], nodes_id[obj], rel])
+    return list(nodes_id), compact_edges
+
+
+def display_graph(triplets=None, nodes=None, edges=None, height=600, key="kg_graph"):
+    """
+    使用 vis-network 组件绘制知识图谱，只向浏览器发送节点/边 JSON
+    :param triplets:    四元组列表（没有 nodes/edges 时使用）
+    :param nodes:       节点名列表
+    :param edges:       边列表，每条为 (主体, 关系, 客体)
+    :param height:      图高度（像素）
+    :param key:         组件 key，保持不变时 rerun 复用同一个 iframe
+    """
+    node_names, compact_edges = build_graph_data(triplets, nodes, edges)
+    return _kg_graph(nodes=node_names, edges=compact_edges, height=height, key=key, default=None)
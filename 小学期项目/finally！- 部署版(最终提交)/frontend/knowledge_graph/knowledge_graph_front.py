@@ -2,8 +2,7 @@ import configparser
 
 import streamlit as st
 import requests
-import streamlit.components.v1 as components
-from knowledge_graph.draw import display_graph_pyvis
+from knowledge_graph.draw import display_graph
 import time
 import json
 import logging
@@ -36,7 +35,7 @@ if st.button("获取专业知识图谱🍊"):
         try:
             response = requests.post(
                 f"http://{backward}/process",
-                json={"text": user_input},
+                json={"text": user_input, "with_kg": True},
                 stream=True,
                 timeout=120
             )
@@ -45,9 +44,11 @@ if st.button("获取专业知识图谱🍊"):
                 st.error(f"后端错误: {response.status_code}")
                 st.stop()
 
+            categories_placeholder = st.empty()
             placeholder = st.empty()
             full_response = ""
             error_flag = False
+            kg_data = None
 
             # 流式输出
             try:
@@ -63,6 +64,24 @@ if st.button("获取专业知识图谱🍊"):
                         data = json.loads(line)
                     except Exception:
                         continue
+                    if data.get("type") == "kg":
+                        # 后端在同一个流中附带的知识图谱子图
+                        kg_data = data.get("content", {})
+                        continue
+                    if data.get("type") == "categories":
+                        # 流水线模式：先收到关键词匹配的专业类，分类完成后收到最终结果
+                        content = data.get("content", {})
+                        label = "识别的专业类别" if content.get("final") else "初步识别的专业类别"
+                        categories_placeholder.caption(f"{label}：{'、'.join(content.get('categories', []))}")
+                        continue
+                    if data.get("type") == "status":
+                        categories_placeholder.caption(data.get("content", ""))
+                        continue
+                    if data.get("type") == "reset":
+                        # 最终专业类与初步结果不同，后端会按最终结果重新解释
+                        full_response = ""
+                        placeholder.markdown(data.get("content", ""))
+                        continue
                     if data.get("type") == "content":
                         full_response += data.get("content", "")
                         placeholder.markdown(full_response + "🍊")
@@ -77,18 +96,21 @@ if st.button("获取专业知识图谱🍊"):
                     time.sleep(0.01)
 
                 if not error_flag:
-                    # 分析文本输出后，自动请求知识图谱
-                    payload = {"text": user_input, "extra": ""}
-                    kg_response = requests.post(f"http://{backward}/get_dynamic_kg", json=payload, timeout=60)
-                    if kg_response.status_code == 200:
-                        kg_data = kg_response.json().get("kg_data", [])
-                        if isinstance(kg_data, list) and kg_data:
-                            html_str = display_graph_pyvis(triplets=[tuple(row) for row in kg_data])
-                            components.html(html_str, height=600, scrolling=True)
+                    if kg_data is None:
+                        # 流中没有附带知识图谱时，再单独请求一次
+                        payload = {"text": user_input, "extra": ""}
+                        kg_response = requests.post(f"http://{backward}/get_dynamic_kg", json=payload, timeout=60)
+                        if kg_response.status_code == 200:
+                            kg_data = kg_response.json()
+                        else:
+                            st.error(f"知识图谱后端错误: {kg_response.status_code}")
+                    if kg_data is not None:
+                        if kg_data.get("edges") or kg_data.get("kg_data"):
+                            display_graph(triplets=kg_data.get("kg_data"),
+                                          nodes=kg_data.get("nodes"),
+                                          edges=kg_data.get("edges"))
                         else:
                             st.warning("分析后知识图谱数据为空！")
-                    else:
-                        st.error(f"知识图谱后端错误: {kg_response.status_code}")
 
             except Exception as e:
                 st.error(f"流式处理错误: {str(e)}")